@@ -0,0 +1,124 @@
+"""Query count and latency of a GET /tasks/ page as the page size grows.
+
+Compares, per page size, against a seeded database:
+
+  legacy   the listing query, then one SELECT per row to resolve its assignee
+           (what TaskService.get_tasks did before hydrate_tasks)
+  batched  TaskService.get_tasks: the listing query plus one IN (...) lookup
+           for every assignee on the page
+
+The user cache is cleared before every page, so the batched path is measured
+cold and always pays its lookup query. Needs a database like benchmarks.run;
+point DATABASE_URL (or --database-url) at a scratch local Postgres.
+
+    python -m benchmarks.hydration --sizes 10 50 100 500 --repeat 50
+"""
+import os
+
+os.environ.setdefault("OUTBOX_WORKER_ENABLED","false")
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlmodel import SQLModel,select,desc
+from src.auth.cache import user_cache
+from src.auth.models import User
+from src.db.main import async_engine,async_session_maker
+from src.tasks.models import Tasks
+from src.tasks.service import TaskService
+from .run import percentile
+from .seed import seed
+import argparse
+import asyncio
+import json
+import time
+
+task_service=TaskService()
+
+
+class StatementCounter:
+    def __init__(self,engine):
+        self.count=0
+        event.listen(engine.sync_engine,"before_cursor_execute",self.before_cursor_execute)
+
+    def before_cursor_execute(self,conn,cursor,statement,parameters,context,executemany):
+        self.count+=1
+
+
+async def legacy(session,limit:int,offset:int)->list[dict]:
+    query=select(Tasks).order_by(desc(Tasks.created_at),desc(Tasks.uid)).limit(limit).offset(offset)
+    tasks=(await session.exec(query)).all()
+    response_tasks=[]
+    for task in tasks:
+        task_dict=task.model_dump()
+        if task.assigned_to:
+            user=(await session.exec(select(User).where(User.uid==task.assigned_to))).first()
+            task_dict['assigned_to']=user.email if user else None
+            task_dict['assigned_to_name']=user.firstname if user else None
+        response_tasks.append(task_dict)
+    return response_tasks
+
+
+async def batched(session,limit:int,offset:int)->list[dict]:
+    return await task_service.get_tasks(session=session,user_uid="",is_admin=True,limit=limit,offset=offset)
+
+
+async def measure(func,counter:StatementCounter,size:int,repeat:int,total:int)->dict:
+    latencies=[]
+    statements=[]
+    for index in range(repeat):
+        offset=(index*size)%max(total-size,1)
+        user_cache.clear()
+        async with async_session_maker() as session:
+            before=counter.count
+            start=time.perf_counter()
+            await func(session,size,offset)
+            latencies.append(time.perf_counter()-start)
+            statements.append(counter.count-before)
+    latencies.sort()
+    return {
+        "queries_per_page":round(sum(statements)/len(statements),1),
+        "p50_ms":round(percentile(latencies,50)*1000,3),
+        "p99_ms":round(percentile(latencies,99)*1000,3),
+    }
+
+
+async def main(args:argparse.Namespace)->dict:
+    engine=async_engine
+    if args.database_url:
+        engine=create_async_engine(args.database_url)
+        async_session_maker.configure(bind=engine)
+    async with engine.begin() as conn:
+        await conn.run_sync(SQLModel.metadata.create_all)
+    if not args.skip_seed:
+        await seed(async_session_maker,args.users,args.tasks,admins=1,seed=args.seed)
+
+    counter=StatementCounter(engine)
+    results={}
+    for size in args.sizes:
+        results[size]={
+            "legacy":await measure(legacy,counter,size,args.repeat,args.tasks),
+            "batched":await measure(batched,counter,size,args.repeat,args.tasks),
+        }
+    await engine.dispose()
+    return results
+
+
+if __name__=="__main__":
+    parser=argparse.ArgumentParser(description=__doc__,formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes",type=int,nargs="+",default=[10,50,100,500])
+    parser.add_argument("--repeat",type=int,default=50,help="pages measured per size and path")
+    parser.add_argument("--users",type=int,default=200)
+    parser.add_argument("--tasks",type=int,default=20000)
+    parser.add_argument("--seed",type=int,default=0)
+    parser.add_argument("--skip-seed",action="store_true",help="reuse the previously seeded dataset")
+    parser.add_argument("--database-url",help="override DATABASE_URL, e.g. a scratch Postgres")
+    parser.add_argument("--json",action="store_true",help="print the results as JSON")
+    args=parser.parse_args()
+    results=asyncio.run(main(args))
+    if args.json:
+        print(json.dumps(results,indent=2))
+    else:
+        print(f"{'size':>6}  {'path':<8}{'queries':>9}{'p50 ms':>10}{'p99 ms':>10}")
+        for size,paths in results.items():
+            for path,stats in paths.items():
+                print(f"{size:>6}  {path:<8}{stats['queries_per_page']:>9}{stats['p50_ms']:>10}{stats['p99_ms']:>10}")
@@ -0,0 +1,101 @@
+"""Messages/sec through the mail transport, against a local SMTP stand-in.
+
+Compares, for a burst of --messages notifications:
+
+  fastmail  FastMail.send_message per message: a new connection, EHLO (and
+            STARTTLS/AUTH when configured) for every email
+  pooled    PooledMailer.send_many over --pool-size long-lived sessions
+
+By default an aiosmtpd server is started in this process, so both paths pay
+its CPU too; pass --host/--port to point at another server instead (for
+STARTTLS or AUTH, edit mail_config through the usual MAIL_* settings).
+The pooled path runs with the rate limit off unless --rate-limit is given.
+
+    python -m benchmarks.mail --messages 1000 --pool-size 4
+"""
+from aiosmtpd.controller import Controller
+from fastapi_mail import FastMail
+from src.mail import PooledMailer,mail_config,create_message
+import argparse
+import asyncio
+import json
+import socket
+import time
+
+
+class CountingHandler:
+    def __init__(self):
+        self.received=0
+
+    async def handle_DATA(self,server,session,envelope):
+        self.received+=1
+        return "250 OK"
+
+
+def free_port()->int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1",0))
+        return sock.getsockname()[1]
+
+
+async def fastmail(config,batch,args)->None:
+    client=FastMail(config)
+    for message in batch:
+        await client.send_message(message)
+
+
+async def pooled(config,batch,args)->None:
+    mailer=PooledMailer(config,pool_size=args.pool_size,rate_limit=args.rate_limit)
+    try:
+        results=await mailer.send_many(batch)
+    finally:
+        await mailer.aclose()
+    errors=[result for result in results if result is not None]
+    if errors:
+        raise errors[0]
+
+
+async def measure(func,config,args)->dict:
+    batch=[create_message(["bench@example.com"],f"Benchmark {index}","<p>Benchmark body</p>") for index in range(args.messages)]
+    start=time.perf_counter()
+    await func(config,batch,args)
+    elapsed=time.perf_counter()-start
+    return {"seconds":round(elapsed,3),"messages_per_sec":round(args.messages/elapsed,1)}
+
+
+def main(args:argparse.Namespace)->dict:
+    controller=None
+    if args.host is None:
+        controller=Controller(CountingHandler(),hostname="127.0.0.1",port=free_port())
+        controller.start()
+        update=dict(MAIL_SERVER=controller.hostname,MAIL_PORT=controller.port,
+                    MAIL_STARTTLS=False,MAIL_SSL_TLS=False,USE_CREDENTIALS=False)
+    else:
+        update=dict(MAIL_SERVER=args.host,MAIL_PORT=args.port)
+    config=mail_config.model_copy(update=update)
+    try:
+        return {
+            "fastmail":asyncio.run(measure(fastmail,config,args)),
+            "pooled":asyncio.run(measure(pooled,config,args)),
+        }
+    finally:
+        if controller is not None:
+            controller.stop()
+
+
+if __name__=="__main__":
+    parser=argparse.ArgumentParser(description=__doc__,formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages",type=int,default=500)
+    parser.add_argument("--pool-size",type=int,default=4)
+    parser.add_argument("--rate-limit",type=float,default=0,help="messages/sec for the pooled path, 0 is unlimited")
+    parser.add_argument("--host",help="SMTP server to use instead of a local aiosmtpd")
+    parser.add_argument("--port",type=int,default=25)
+    parser.add_argument("--json",action="store_true",help="print the results as JSON")
+    args=parser.parse_args()
+    results=main(args)
+    if args.json:
+        print(json.dumps(results,indent=2))
+    else:
+        print(f"{'path':<10}{'seconds':>9}{'msg/s':>10}")
+        for path,stats in results.items():
+            print(f"{path:<10}{stats['seconds']:>9}{stats['messages_per_sec']:>10}")
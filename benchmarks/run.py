@@ -0,0 +1,308 @@
+"""End-to-end load test for the task API.
+
+Seeds a dataset (see benchmarks.seed), then drives the real FastAPI app from
+src/__init__.py in-process with concurrent httpx clients through login, list,
+filter, detail and a create/update/delete cycle, and reports RPS and
+p50/p95/p99 per route. A probe task also measures how late the event loop
+wakes up (the stall that blocking work such as password hashing causes
+every other request). Results are written as JSON; pass --compare with an
+earlier file to see the change per route.
+
+--scenario picks the request mix: "mixed" is mostly reads with the odd
+login, "login-heavy" makes a third of the steps logins, to show what bcrypt
+does to list/detail latency and loop stall.
+
+Needs the same .env as the app, a reachable Redis, and a database: point
+DATABASE_URL (or --database-url) at a scratch local Postgres.
+
+    python -m benchmarks.run --users 200 --tasks 50000 --concurrency 50 --duration 60
+    python -m benchmarks.run --skip-seed --compare benchmarks/results/<earlier>.json
+    python -m benchmarks.run --skip-seed --scenario login-heavy
+"""
+import os
+
+# Read by src.config at import time: don't let the login rate limits or the
+# SMTP outbox worker shape the numbers unless asked to
+os.environ.setdefault("RATE_LIMIT_ENABLED","false")
+os.environ.setdefault("OUTBOX_WORKER_ENABLED","false")
+# One process, so it may mint its own JWT signing key
+os.environ.setdefault("JWT_KEY_AUTOGENERATE","true")
+
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlmodel import SQLModel
+from datetime import date,datetime,timedelta
+from pathlib import Path
+from src import app
+from src.db.main import async_engine,async_session_maker
+from src.tasks.utils import TaskStatus,TaskPriority
+from .seed import seed,bench_email,PASSWORD
+import argparse
+import asyncio
+import httpx
+import json
+import random
+import subprocess
+import time
+
+RESULTS_DIR=Path(__file__).resolve().parent/"results"
+API="/api/v1"
+
+# Relative weight of each step per scenario; "write" is a create, update and delete
+SCENARIOS={
+    "mixed":{"list":35,"filter":25,"detail":30,"write":8,"login":2},
+    "login-heavy":{"list":25,"filter":15,"detail":25,"write":2,"login":33},
+}
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies:dict[str,list[float]]={}
+        self.errors:dict[str,int]={}
+        self.recording=False
+
+    def record(self,route:str,seconds:float,ok:bool)->None:
+        if not self.recording:
+            return
+        self.latencies.setdefault(route,[]).append(seconds)
+        if not ok:
+            self.errors[route]=self.errors.get(route,0)+1
+
+
+class LoopMonitor:
+    """Sleeps for a fixed interval and records how much later than asked it woke up"""
+    def __init__(self,interval:float):
+        self.interval=interval
+        self.stalls:list[float]=[]
+        self.recording=False
+
+    async def run(self)->None:
+        while True:
+            start=time.perf_counter()
+            await asyncio.sleep(self.interval)
+            if self.recording:
+                self.stalls.append(max(time.perf_counter()-start-self.interval,0.0))
+
+    def summary(self)->dict:
+        values=sorted(self.stalls)
+        return {
+            "interval_ms":self.interval*1000,
+            "samples":len(values),
+            "p50_ms":round(percentile(values,50)*1000,3),
+            "p99_ms":round(percentile(values,99)*1000,3),
+            "max_ms":round(values[-1]*1000,3) if values else 0.0,
+        }
+
+
+def percentile(values:list[float],pct:float)->float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not values:
+        return 0.0
+    rank=max(1,round(pct/100*len(values)))
+    return values[min(rank,len(values))-1]
+
+
+def summarize(latencies:list[float],errors:int,elapsed:float)->dict:
+    values=sorted(latencies)
+    return {
+        "requests":len(values),
+        "errors":errors,
+        "rps":round(len(values)/elapsed,2) if elapsed else 0.0,
+        "mean_ms":round(sum(values)/len(values)*1000,3) if values else 0.0,
+        "p50_ms":round(percentile(values,50)*1000,3),
+        "p95_ms":round(percentile(values,95)*1000,3),
+        "p99_ms":round(percentile(values,99)*1000,3),
+        "max_ms":round(values[-1]*1000,3) if values else 0.0,
+    }
+
+
+class VirtualUser:
+    def __init__(self,client:httpx.AsyncClient,recorder:Recorder,email:str,account:dict,rng:random.Random,weights:dict[str,int]):
+        self.client=client
+        self.recorder=recorder
+        self.email=email
+        self.is_admin=account["role"]=="admin"
+        self.tasks=account["tasks"]
+        self.rng=rng
+        self.weights=weights
+        self.headers={}
+
+    async def request(self,route:str,method:str,url:str,expected:int=200,**kwargs)->httpx.Response:
+        start=time.perf_counter()
+        try:
+            response=await self.client.request(method,url,headers=self.headers,**kwargs)
+            ok=response.status_code==expected
+        except httpx.HTTPError:
+            response=None
+            ok=False
+        self.recorder.record(route,time.perf_counter()-start,ok)
+        return response
+
+    async def login(self)->None:
+        response=await self.request("login","POST",f"{API}/auth/login",
+                                    json={"email":self.email,"password":PASSWORD})
+        if response is not None and response.status_code==200:
+            self.headers={"Authorization":f"Bearer {response.json()['access_token']}"}
+
+    async def list_tasks(self)->None:
+        await self.request("list","GET",f"{API}/task/tasks/",params={"limit":20})
+
+    async def filter_tasks(self)->None:
+        params={"limit":20,"status":self.rng.choice(list(TaskStatus)).value}
+        if self.rng.random()<0.5:
+            params["priority"]=self.rng.choice(list(TaskPriority)).value
+        await self.request("filter","GET",f"{API}/task/tasks/",params=params)
+
+    async def task_detail(self)->None:
+        if not self.tasks:
+            return await self.list_tasks()
+        await self.request("detail","GET",f"{API}/task/task/{self.rng.choice(self.tasks)}")
+
+    async def write_cycle(self)->None:
+        # Creating tasks is admin only, everyone else reads instead
+        if not self.is_admin:
+            return await self.list_tasks()
+        payload={
+            "title":"Load test task",
+            "description":"Created by benchmarks.run",
+            "priority":self.rng.choice(list(TaskPriority)).value,
+            "due_date":(date.today()+timedelta(days=7)).isoformat(),
+            "assigned_to":self.email,
+        }
+        response=await self.request("create","POST",f"{API}/task/tasks/",json=payload)
+        if response is None or response.status_code!=200:
+            return
+        uid=response.json()["uid"]
+        await self.request("update","PATCH",f"{API}/task/tasks/{uid}",json={"status":TaskStatus.in_progress.value})
+        await self.request("delete","DELETE",f"{API}/task/tasks/{uid}",expected=204)
+
+    async def run(self,deadline:float)->None:
+        steps={
+            "list":self.list_tasks,
+            "filter":self.filter_tasks,
+            "detail":self.task_detail,
+            "write":self.write_cycle,
+            "login":self.login,
+        }
+        names,weights=zip(*self.weights.items())
+        await self.login()
+        while time.monotonic()<deadline:
+            await steps[self.rng.choices(names,weights)[0]]()
+
+
+def git_commit()->str | None:
+    try:
+        return subprocess.run(["git","rev-parse","HEAD"],capture_output=True,text=True,check=True).stdout.strip()
+    except (OSError,subprocess.CalledProcessError):
+        return None
+
+
+def compare(current:dict,previous:dict)->None:
+    print(f"\n{'route':<10}{'rps':>20}{'p95 ms':>24}")
+    for route,stats in current["routes"].items():
+        before=previous.get("routes",{}).get(route)
+        if before is None:
+            continue
+        print(f"{route:<10}{before['rps']:>9} -> {stats['rps']:<9}{before['p95_ms']:>11} -> {stats['p95_ms']:<9}")
+    stall=previous.get("event_loop")
+    if stall is not None:
+        print(f"{'loop p99':<10}{'':>20}{stall['p99_ms']:>11} -> {current['event_loop']['p99_ms']:<9}")
+
+
+def report(results:dict)->None:
+    print(f"\n{'route':<10}{'requests':>10}{'errors':>8}{'rps':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for route,stats in [*results["routes"].items(),("total",results["total"])]:
+        print(f"{route:<10}{stats['requests']:>10}{stats['errors']:>8}{stats['rps']:>10}"
+              f"{stats['p50_ms']:>10}{stats['p95_ms']:>10}{stats['p99_ms']:>10}")
+    stall=results["event_loop"]
+    print(f"\nevent loop stall ({results['config']['scenario']}): p50 {stall['p50_ms']} ms, "
+          f"p99 {stall['p99_ms']} ms, max {stall['max_ms']} ms over {stall['samples']} samples")
+
+
+async def main(args:argparse.Namespace)->dict:
+    engine=async_engine
+    if args.database_url:
+        engine=create_async_engine(args.database_url)
+        async_session_maker.configure(bind=engine)
+    async with engine.begin() as conn:
+        await conn.run_sync(SQLModel.metadata.create_all)
+
+    accounts_file=RESULTS_DIR/"accounts.json"
+    RESULTS_DIR.mkdir(parents=True,exist_ok=True)
+    if args.skip_seed:
+        accounts=json.loads(accounts_file.read_text())
+    else:
+        start=time.perf_counter()
+        accounts=await seed(async_session_maker,args.users,args.tasks,args.admins,args.seed)
+        accounts_file.write_text(json.dumps(accounts))
+        print(f"seeded {args.users} users and {args.tasks} tasks in {time.perf_counter()-start:.1f}s")
+
+    recorder=Recorder()
+    monitor=LoopMonitor(args.stall_interval/1000)
+    rng=random.Random(args.seed)
+    emails=[bench_email(index) for index in range(len(accounts))]
+    if args.base_url:
+        transport,base_url=None,args.base_url
+    else:
+        transport,base_url=httpx.ASGITransport(app=app),"http://bench"
+
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(transport=transport,base_url=base_url,timeout=args.timeout) as client:
+            users=[
+                VirtualUser(client,recorder,email,accounts[email],random.Random(rng.random()),SCENARIOS[args.scenario])
+                for email in (emails[index%len(emails)] for index in range(args.concurrency))
+            ]
+            if args.warmup:
+                deadline=time.monotonic()+args.warmup
+                await asyncio.gather(*(user.run(deadline) for user in users))
+            probe=asyncio.create_task(monitor.run())
+            recorder.recording=monitor.recording=True
+            started=time.monotonic()
+            await asyncio.gather(*(user.run(started+args.duration) for user in users))
+            elapsed=time.monotonic()-started
+            probe.cancel()
+    await engine.dispose()
+
+    all_latencies=[value for values in recorder.latencies.values() for value in values]
+    return {
+        "started_at":datetime.now().isoformat(timespec="seconds"),
+        "git_commit":git_commit(),
+        "config":{key:value for key,value in vars(args).items() if key not in ("output","compare")},
+        "elapsed_s":round(elapsed,3),
+        "routes":{
+            route:summarize(values,recorder.errors.get(route,0),elapsed)
+            for route,values in sorted(recorder.latencies.items())
+        },
+        "total":summarize(all_latencies,sum(recorder.errors.values()),elapsed),
+        "event_loop":monitor.summary(),
+    }
+
+
+def parse_args()->argparse.Namespace:
+    parser=argparse.ArgumentParser(description=__doc__,formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users",type=int,default=100)
+    parser.add_argument("--admins",type=int,default=10,help="how many of --users are admins")
+    parser.add_argument("--tasks",type=int,default=10000)
+    parser.add_argument("--seed",type=int,default=0,help="random seed for data and scenario")
+    parser.add_argument("--skip-seed",action="store_true",help="reuse the previously seeded dataset")
+    parser.add_argument("--scenario",choices=SCENARIOS,default="mixed",help="request mix, see above")
+    parser.add_argument("--concurrency",type=int,default=20,help="concurrent virtual users")
+    parser.add_argument("--duration",type=float,default=30,help="measured seconds")
+    parser.add_argument("--warmup",type=float,default=5,help="unmeasured seconds before the run")
+    parser.add_argument("--timeout",type=float,default=30)
+    parser.add_argument("--stall-interval",type=float,default=10,help="event loop probe interval in ms")
+    parser.add_argument("--database-url",help="override DATABASE_URL, e.g. a scratch Postgres")
+    parser.add_argument("--base-url",help="load a running server instead of the in-process app")
+    parser.add_argument("--output",type=Path,help="results file, default benchmarks/results/<timestamp>.json")
+    parser.add_argument("--compare",type=Path,help="earlier results file to diff against")
+    return parser.parse_args()
+
+
+if __name__=="__main__":
+    args=parse_args()
+    results=asyncio.run(main(args))
+    report(results)
+    output=args.output or RESULTS_DIR/f"{datetime.now():%Y%m%d-%H%M%S}.json"
+    output.write_text(json.dumps(results,indent=2,default=str))
+    print(f"\nresults written to {output}")
+    if args.compare:
+        compare(results,json.loads(args.compare.read_text()))
@@ -0,0 +1,112 @@
+"""Seed a benchmark dataset of users and tasks.
+
+Users are bench-user-{i}@bench.example.com, all verified, sharing one password; the
+first `admins` of them are admins. Tasks follow rough production shapes: most
+are open, medium priority dominates, three in four are assigned, and both
+creators and assignees are skewed so a few users own most of the work.
+"""
+from sqlalchemy import delete,insert
+from src.auth.models import User
+from src.auth.utils import generate_password_hash
+from src.tasks.models import Tasks
+from src.tasks.utils import TaskStatus,TaskPriority
+from datetime import datetime,timedelta
+import random
+import uuid
+
+EMAIL_DOMAIN="bench.example.com"
+PASSWORD="bench-password"
+CHUNK_SIZE=1000
+
+STATUS_WEIGHTS={TaskStatus.pending:45,TaskStatus.in_progress:35,TaskStatus.completed:20}
+PRIORITY_WEIGHTS={TaskPriority.low:25,TaskPriority.medium:50,TaskPriority.high:25}
+ASSIGNED_RATIO=0.75
+HISTORY_DAYS=180
+
+
+def bench_email(index:int)->str:
+    return f"bench-user-{index}@{EMAIL_DOMAIN}"
+
+
+def skewed_weights(count:int)->list[float]:
+    # Zipf-like: user k gets work in proportion to 1/k
+    return [1/(rank+1) for rank in range(count)]
+
+
+def build_users(count:int,admins:int)->list[dict]:
+    password_hash=generate_password_hash(PASSWORD)
+    now=datetime.now()
+    return [
+        dict(
+            uid=uuid.uuid4(),
+            username=f"bench{index}",
+            email=bench_email(index),
+            firstname="Bench",
+            lastname=f"User{index}",
+            role="admin" if index<admins else "user",
+            is_verified=True,
+            password_hash=password_hash,
+            created_at=now,
+            updated_at=now
+        )
+        for index in range(count)
+    ]
+
+
+def build_tasks(count:int,user_uids:list[uuid.UUID],rng:random.Random)->list[dict]:
+    weights=skewed_weights(len(user_uids))
+    statuses,status_weights=zip(*STATUS_WEIGHTS.items())
+    priorities,priority_weights=zip(*PRIORITY_WEIGHTS.items())
+    now=datetime.now()
+    tasks=[]
+    for index in range(count):
+        created_at=now-timedelta(seconds=rng.uniform(0,HISTORY_DAYS*86400))
+        assigned=rng.random()<ASSIGNED_RATIO
+        tasks.append(dict(
+            uid=uuid.uuid4(),
+            title=f"Benchmark task {index}",
+            description="Seeded by benchmarks.seed",
+            status=rng.choices(statuses,status_weights)[0],
+            priority=rng.choices(priorities,priority_weights)[0],
+            due_date=(created_at+timedelta(days=rng.randint(1,60))).date(),
+            created_by=rng.choices(user_uids,weights)[0],
+            assigned_to=rng.choices(user_uids,weights)[0] if assigned else None,
+            created_at=created_at,
+            updated_at=created_at
+        ))
+    return tasks
+
+
+async def seed(session_maker,users:int,tasks:int,admins:int,seed:int=0)->dict:
+    """Replace any previous benchmark data and return what the load test needs.
+
+    The result maps each user's email to the uids of tasks they can see, plus
+    every task uid for admins.
+    """
+    rng=random.Random(seed)
+    user_rows=build_users(users,admins)
+    user_uids=[row["uid"] for row in user_rows]
+    task_rows=build_tasks(tasks,user_uids,rng)
+
+    async with session_maker() as session:
+        # Tasks go with their creator through ON DELETE CASCADE
+        await session.execute(delete(User).where(User.email.like(f"%@{EMAIL_DOMAIN}")))
+        for start in range(0,len(user_rows),CHUNK_SIZE):
+            await session.execute(insert(User),user_rows[start:start+CHUNK_SIZE])
+        for start in range(0,len(task_rows),CHUNK_SIZE):
+            await session.execute(insert(Tasks),task_rows[start:start+CHUNK_SIZE])
+        await session.commit()
+
+    all_tasks=[str(row["uid"]) for row in task_rows]
+    visible={row["uid"]:[] for row in user_rows}
+    for row in task_rows:
+        visible[row["created_by"]].append(str(row["uid"]))
+        if row["assigned_to"] is not None and row["assigned_to"]!=row["created_by"]:
+            visible[row["assigned_to"]].append(str(row["uid"]))
+    return {
+        row["email"]:{
+            "role":row["role"],
+            "tasks":all_tasks if row["role"]=="admin" else visible[row["uid"]]
+        }
+        for row in user_rows
+    }
@@ -0,0 +1,41 @@
+"""add task indexes
+
+Revision ID: 5b2e9c1d7f40
+Revises: d0c86574f88f
+Create Date: 2026-10-18 10:02:11.418305
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5b2e9c1d7f40'
+down_revision: Union[str, Sequence[str], None] = 'd0c86574f88f'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_tasks_created_at_uid', 'tasks', ['created_at', 'uid'], unique=False)
+    op.create_index('ix_tasks_created_by_created_at_uid', 'tasks', ['created_by', 'created_at', 'uid'], unique=False)
+    op.create_index('ix_tasks_assigned_to_created_at_uid', 'tasks', ['assigned_to', 'created_at', 'uid'], unique=False,
+               postgresql_where=sa.text('assigned_to IS NOT NULL'))
+    op.create_index('ix_tasks_status_created_at_uid', 'tasks', ['status', 'created_at', 'uid'], unique=False)
+    op.create_index('ix_tasks_priority_created_at_uid', 'tasks', ['priority', 'created_at', 'uid'], unique=False)
+    # users are looked up by email on every login and task assignment
+    op.create_index('ix_users_email', 'users', ['email'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_users_email', table_name='users')
+    op.drop_index('ix_tasks_priority_created_at_uid', table_name='tasks')
+    op.drop_index('ix_tasks_status_created_at_uid', table_name='tasks')
+    op.drop_index('ix_tasks_assigned_to_created_at_uid', table_name='tasks', postgresql_where=sa.text('assigned_to IS NOT NULL'))
+    op.drop_index('ix_tasks_created_by_created_at_uid', table_name='tasks')
+    op.drop_index('ix_tasks_created_at_uid', table_name='tasks')
@@ -1,21 +1,50 @@
 from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse
+from contextlib import asynccontextmanager
+import asyncio
 from src.auth.routes import auth_router
 from src.db.main import init_db
 from src.users.routes import user_router
 from src.tasks.routes import task_router
+from src.db.routes import db_router
+from src.collaboration.routes import collaboration_router
 from .errors import register_all_errors
 from .middleware import register_middleware
-def init_db():
+from src.auth.cache import user_cache
+from src.auth.keys import key_ring
+from src.db.redis import blocklist_mirror
+from src.email.service import outbox_service
+from src.collaboration.service import collaboration_service
+from src.config import Config
+from src.mail import mail as mailer
+from src.metrics import metrics_router,mark_process_dead
+
+@asynccontextmanager
+async def lifespan(app:FastAPI):
     print("Server started")
-    init_db()
+    # Fail at startup, not on the first login, if no signing key is available
+    key_ring.active()
+    background=[
+        asyncio.create_task(user_cache.listen_for_invalidations()),
+        asyncio.create_task(blocklist_mirror.listen()),
+        asyncio.create_task(collaboration_service.listen())
+    ]
+    if Config.OUTBOX_WORKER_ENABLED:
+        background.append(asyncio.create_task(outbox_service.run_worker()))
     yield
+    for task in background:
+        task.cancel()
+    await mailer.aclose()
+    mark_process_dead()
     print("Server stopped")
 
 version="v1"
 app=FastAPI(
     version=version,
     title="Task Delegation & Collaboration API",
-    description="Task Delegation & Collaboration API"
+    description="Task Delegation & Collaboration API",
+    default_response_class=ORJSONResponse,
+    lifespan=lifespan
 )
 register_all_errors(app)
 register_middleware(app)
@@ -23,6 +52,9 @@ register_middleware(app)
 app.include_router(auth_router,prefix=f"/api/{version}/auth",tags=["auth"])
 app.include_router(user_router,prefix=f"/api/{version}/user",tags=["user"])
 app.include_router(task_router,prefix=f"/api/{version}/task",tags=["task"])
+app.include_router(db_router,prefix=f"/api/{version}/db",tags=["db"])
+app.include_router(collaboration_router,prefix=f"/api/{version}/collaboration",tags=["collaboration"])
+app.include_router(metrics_router)
 
 
 
@@ -0,0 +1,155 @@
+from collections import OrderedDict
+from redis.exceptions import RedisError
+from src.db.redis import token_blocklist
+from src.config import Config
+from .models import User
+import asyncio
+import hashlib
+import json
+import logging
+import time
+import uuid
+
+USER_CACHE_CHANNEL="auth:user-cache:invalidate"
+
+
+def _normalize_uid(uid)->uuid.UUID | None:
+    if isinstance(uid,uuid.UUID):
+        return uid
+    try:
+        return uuid.UUID(str(uid))
+    except ValueError:
+        return None
+
+
+class UserCache:
+    """Bounded LRU+TTL cache of user rows, addressable by uid and by email.
+
+    Entries are detached snapshots, never the instance of a live session, so
+    a rollback elsewhere can't expire them and callers that need to write
+    must merge them into their own session first (see AuthService.update_user).
+    Other workers are told to drop an entry over Redis pub/sub; a missed
+    message is bounded by USER_CACHE_TTL.
+    """
+
+    def __init__(self,maxsize:int=Config.USER_CACHE_SIZE,ttl:int=Config.USER_CACHE_TTL):
+        self.maxsize=maxsize
+        self.ttl=ttl
+        self._by_uid:OrderedDict[uuid.UUID,tuple[float,User]]=OrderedDict()
+        self._uid_by_email:dict[str,uuid.UUID]={}
+
+    @staticmethod
+    def _snapshot(user:User)->User:
+        return User(**{column.name:getattr(user,column.name) for column in User.__table__.columns})
+
+    def get_by_uid(self,uid)->User | None:
+        uid=_normalize_uid(uid)
+        entry=self._by_uid.get(uid)
+        if entry is None:
+            return None
+        expires_at,user=entry
+        if expires_at<time.monotonic():
+            self._discard(uid)
+            return None
+        self._by_uid.move_to_end(uid)
+        return user
+
+    def get_by_email(self,email:str)->User | None:
+        uid=self._uid_by_email.get(email)
+        return self.get_by_uid(uid) if uid is not None else None
+
+    def put(self,user:User)->User:
+        snapshot=self._snapshot(user)
+        self._discard(snapshot.uid)
+        self._by_uid[snapshot.uid]=(time.monotonic()+self.ttl,snapshot)
+        self._uid_by_email[snapshot.email]=snapshot.uid
+        while len(self._by_uid)>self.maxsize:
+            self._discard(next(iter(self._by_uid)))
+        return snapshot
+
+    def _discard(self,uid)->None:
+        entry=self._by_uid.pop(uid,None)
+        if entry is not None and self._uid_by_email.get(entry[1].email)==uid:
+            del self._uid_by_email[entry[1].email]
+
+    def invalidate(self,uid=None,email:str | None=None)->None:
+        if email is not None:
+            cached_uid=self._uid_by_email.pop(email,None)
+            if cached_uid is not None:
+                self._discard(cached_uid)
+        if uid is not None:
+            self._discard(_normalize_uid(uid))
+
+    def clear(self)->None:
+        self._by_uid.clear()
+        self._uid_by_email.clear()
+
+    async def publish_invalidation(self,uid=None,email:str | None=None)->None:
+        """Drop the entry here and ask every other worker to do the same"""
+        self.invalidate(uid,email)
+        message=json.dumps({"uid":str(uid) if uid else None,"email":email})
+        try:
+            await token_blocklist.publish(USER_CACHE_CHANNEL,message)
+        except RedisError as e:
+            logging.warning("user cache invalidation not published: %s",e)
+
+    async def listen_for_invalidations(self)->None:
+        """Background task applying invalidations published by other workers"""
+        while True:
+            pubsub=token_blocklist.pubsub()
+            try:
+                await pubsub.subscribe(USER_CACHE_CHANNEL)
+                # Anything published while we were unsubscribed is lost
+                self.clear()
+                async for message in pubsub.listen():
+                    if message["type"]!="message":
+                        continue
+                    data=json.loads(message["data"])
+                    self.invalidate(data.get("uid"),data.get("email"))
+            except asyncio.CancelledError:
+                raise
+            except (RedisError,ValueError) as e:
+                logging.warning("user cache subscriber disconnected: %s",e)
+                await asyncio.sleep(1)
+            finally:
+                await pubsub.aclose()
+
+
+class ClaimsCache:
+    """Verified JWT claims keyed by a digest of the token.
+
+    Lets a token be signature-checked and parsed once, not on every request.
+    Entries are dropped at the token's own exp, and the oldest entries are
+    evicted past TOKEN_CACHE_SIZE. Revocation is not cached here; the
+    blocklist is still consulted per request.
+    """
+
+    def __init__(self,maxsize:int=Config.TOKEN_CACHE_SIZE):
+        self.maxsize=maxsize
+        self._claims:OrderedDict[bytes,dict]=OrderedDict()
+
+    @staticmethod
+    def _digest(token:str)->bytes:
+        return hashlib.sha256(token.encode()).digest()
+
+    def get(self,token:str)->dict | None:
+        key=self._digest(token)
+        claims=self._claims.get(key)
+        if claims is None:
+            return None
+        if claims.get("exp",0)<=time.time():
+            del self._claims[key]
+            return None
+        self._claims.move_to_end(key)
+        return claims
+
+    def put(self,token:str,claims:dict)->None:
+        key=self._digest(token)
+        self._claims[key]=claims
+        self._claims.move_to_end(key)
+        while len(self._claims)>self.maxsize:
+            self._claims.popitem(last=False)
+
+
+user_cache=UserCache()
+claims_cache=ClaimsCache()
@@ -1,37 +1,79 @@
 from fastapi.security import HTTPBearer
 from fastapi import Request,status,Depends
 from fastapi.security.http import HTTPAuthorizationCredentials
-from .utils import decode_token
+from .utils import decode_token_cached
 from fastapi.exceptions import HTTPException
-from src.db.redis import token_in_blocklist
+from src.db.redis import token_revoked
 from src.db.main import get_session
 from sqlmodel.ext.asyncio.session import AsyncSession
 from .service import AuthService
 from typing import List
 from .models import User
+from src.tracing import tracer
 user_service=AuthService()
+
+
+class Principal:
+    """The authenticated caller, resolved once per request and kept on request.state.
+
+    Holds the verified token claims; the user row is only loaded (through the
+    AuthService user cache) when something actually needs it.
+    """
+
+    def __init__(self,claims:dict):
+        self.claims=claims
+        self._user:User | None=None
+
+    @property
+    def uid(self)->str:
+        return self.claims['user']['user_uid']
+
+    @property
+    def email(self)->str:
+        return self.claims['user']['email']
+
+    async def get_user(self,session:AsyncSession)->User | None:
+        if self._user is None:
+            self._user=await user_service.get_user_by_uid(self.uid,session)
+        return self._user
+
+    async def get_role(self,session:AsyncSession)->str | None:
+        role=self.claims['user'].get('role')
+        if role is None:
+            # Tokens minted before the role claim was added everywhere
+            user=await self.get_user(session)
+            role=user.role if user else None
+        return role
+
+
 class TokenBearer(HTTPBearer):
     def __init__(self, auto_error = True):
         super().__init__( auto_error=auto_error)
 
 
     async def __call__(self, request:Request)->HTTPAuthorizationCredentials | None:
-        creds= await super().__call__(request)
-        token=creds.credentials
-        token_data=decode_token(token)
-        if not self.token_valid(token):
-            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN,detail={"error":"This token is invalid or been expired",
-                                                                              "resolution":"Please get new token "})
-        if await token_in_blocklist(token_data['jti']):
-            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN,detail={"error":"This token is invalid or been revoked",
-                                                                              "resolution":"Please get new token "})
-             
-       
-        self.verify_token_data(token_data)
-        return token_data
+        # Several dependencies of one route verify the same token, do it once
+        principal=getattr(request.state,"principal",None)
+        if principal is None:
+            with tracer.span("auth.token"):
+                creds= await super().__call__(request)
+                token=creds.credentials
+                with tracer.span("auth.decode"):
+                    token_data=decode_token_cached(token)
+                if token_data is None:
+                    raise HTTPException(status_code=status.HTTP_403_FORBIDDEN,detail={"error":"This token is invalid or been expired",
+                                                                                      "resolution":"Please get new token "})
+                if await token_revoked(token_data['jti'],token_data['user']['user_uid'],token_data.get('gen',0)):
+                    raise HTTPException(status_code=status.HTTP_403_FORBIDDEN,detail={"error":"This token is invalid or been revoked",
+                                                                                      "resolution":"Please get new token "})
+                principal=Principal(token_data)
+                request.state.principal=principal
+
+        self.verify_token_data(principal.claims)
+        return principal.claims
 
     def token_valid(self,token:str)->bool:
-        token_data=decode_token(token)
+        token_data=decode_token_cached(token)
         return True if token_data is not None else False
     
     def verify_token_data(self,token_data:str):
@@ -50,9 +92,12 @@ class RefreshTokenBearer(TokenBearer):
                 raise HTTPException(status_code=status.HTTP_403_FORBIDDEN,detail="Please provide refresh token")
 
     
-async def get_current_user(token_details:dict=Depends(AccessTokenBearer()),session:AsyncSession=Depends(get_session)):
-    user_email=token_details['user']['email']
-    user=await user_service.get_user_by_email(user_email,session)
+async def get_principal(request:Request,_:dict=Depends(AccessTokenBearer()))->Principal:
+    return request.state.principal
+
+
+async def get_current_user(principal:Principal=Depends(get_principal),session:AsyncSession=Depends(get_session)):
+    user=await principal.get_user(session)
     return user
 
 
@@ -60,13 +105,14 @@ class RoleChecker:
     def __init__(self,allowed_roles:List[str])->None:
           self.allowed_roles=allowed_roles
 
-    def __call__(self, cuurent_user:User=Depends(get_current_user)):
-        if  not cuurent_user.is_verified:
+    async def __call__(self, principal:Principal=Depends(get_principal),session:AsyncSession=Depends(get_session)):
+        # Role comes from the claims, is_verified from the cached user row
+        user=await principal.get_user(session)
+        if user is None or not user.is_verified:
              raise HTTPException(status_code=status.HTTP_403_FORBIDDEN,detail="Account not verified")
-        if cuurent_user.role in self.allowed_roles:
+        if await principal.get_role(session) in self.allowed_roles:
              return True
         
         raise HTTPException(
              status_code=status.HTTP_403_FORBIDDEN,detail="You are not allowed to performthis action"
         )
-
@@ -0,0 +1,185 @@
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ec,ed25519
+from jwt.algorithms import get_default_algorithms
+from src.config import Config
+from pathlib import Path
+import hashlib
+import json
+import logging
+import os
+import sys
+import time
+import uuid
+
+DAY=86400
+# Unknown kids trigger a reload from disk, but no more often than this
+RELOAD_INTERVAL=5
+
+
+class SigningKey:
+    def __init__(self,kid:str,algorithm:str,private_key,created_at:float):
+        self.kid=kid
+        self.algorithm=algorithm
+        self.private_key=private_key
+        self.public_key=private_key.public_key()
+        self.created_at=created_at
+
+    def jwk(self)->dict:
+        jwk=get_default_algorithms()[self.algorithm].to_jwk(self.public_key,as_dict=True)
+        jwk.update({"kid":self.kid,"alg":self.algorithm,"use":"sig"})
+        return jwk
+
+
+class KeyRing:
+    """Asymmetric JWT signing keys, stored as {kid}.pem files in one directory.
+
+    The newest key signs; a replaced key still verifies for retention after
+    its successor was created, so tokens outlive the key that signed them. A token is only
+    accepted by a process that can see the key it names, so every host behind
+    the load balancer must read the same directory (a shared volume or a
+    mounted secret). Keys are created there by `python -m src.auth.keys
+    rotate`, run once per rotation period by deploy tooling or cron; hosts
+    pick a new key up on their next reload or on the first token carrying
+    its kid.
+
+    With autogenerate (JWT_KEY_AUTOGENERATE, single-host setups only) a
+    worker creates the first key and rotates it itself. Otherwise an overdue
+    key keeps signing, with a warning, and a missing one is an error.
+    """
+
+    def __init__(self,directory:str,algorithm:str,rotation_days:int,retention_days:int,autogenerate:bool=False):
+        self.directory=Path(directory)
+        self.algorithm=algorithm
+        self.rotation=rotation_days*DAY
+        self.retention=retention_days*DAY
+        self.autogenerate=autogenerate
+        self.overdue_warned=False
+        self.keys:dict[str,SigningKey]={}
+        self.loaded_at=0.0
+        self.jwks_body=b'{"keys":[]}'
+        self.jwks_etag='"0"'
+
+    def generate_private_key(self):
+        if self.algorithm=="EdDSA":
+            return ed25519.Ed25519PrivateKey.generate()
+        if self.algorithm=="ES256":
+            return ec.generate_private_key(ec.SECP256R1())
+        raise ValueError(f"Unsupported JWT signing algorithm {self.algorithm}")
+
+    def load(self)->None:
+        now=time.time()
+        keys={}
+        for path in self.directory.glob("*.pem"):
+            created_at=path.stat().st_mtime
+            try:
+                private_key=serialization.load_pem_private_key(path.read_bytes(),password=None)
+            except ValueError as e:
+                logging.warning("skipping unreadable signing key %s: %s",path.name,e)
+                continue
+            algorithm="EdDSA" if isinstance(private_key,ed25519.Ed25519PrivateKey) else "ES256"
+            keys[path.stem]=SigningKey(path.stem,algorithm,private_key,created_at)
+        expired=self.expired({kid:key.created_at for kid,key in keys.items()},now)
+        keys={kid:key for kid,key in keys.items() if kid not in expired}
+        self.keys=keys
+        self.loaded_at=now
+        if not self.due(self.newest()):
+            self.overdue_warned=False
+        body=json.dumps({"keys":[key.jwk() for key in keys.values()]},sort_keys=True).encode()
+        self.jwks_body=body
+        self.jwks_etag=f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+
+    def generate(self)->None:
+        self.directory.mkdir(parents=True,exist_ok=True)
+        kid=uuid.uuid4().hex
+        pem=self.generate_private_key().private_bytes(
+            encoding=serialization.Encoding.PEM,
+            format=serialization.PrivateFormat.PKCS8,
+            encryption_algorithm=serialization.NoEncryption()
+        )
+        fd=os.open(self.directory/f"{kid}.pem",os.O_WRONLY|os.O_CREAT|os.O_EXCL,0o600)
+        with os.fdopen(fd,"wb") as file:
+            file.write(pem)
+        logging.info("generated JWT signing key %s",kid)
+
+    def expired(self,created_at:dict[str,float],now:float)->set[str]:
+        """Keys replaced more than retention ago, so every token they signed has expired.
+
+        Counted from when the next key took over, not from creation, so a
+        key that kept signing past its rotation is still kept long enough.
+        """
+        order=sorted(created_at,key=created_at.get)
+        return {kid for kid,successor in zip(order,order[1:]) if now-created_at[successor]>self.retention}
+
+    def prune(self)->None:
+        """Delete expired key files; only the rotating process does this"""
+        paths={path.stem:path for path in self.directory.glob("*.pem")}
+        created_at={kid:path.stat().st_mtime for kid,path in paths.items()}
+        for kid in self.expired(created_at,time.time()):
+            paths[kid].unlink(missing_ok=True)
+
+    def rotate(self)->None:
+        self.generate()
+        self.prune()
+        self.load()
+
+    def newest(self)->SigningKey | None:
+        candidates=[key for key in self.keys.values() if key.algorithm==self.algorithm]
+        return max(candidates,key=lambda key:key.created_at,default=None)
+
+    def due(self,key:SigningKey | None)->bool:
+        return key is None or time.time()-key.created_at>=self.rotation
+
+    def active(self)->SigningKey:
+        key=self.newest()
+        if not self.due(key):
+            return key
+        if self.autogenerate or time.time()-self.loaded_at>=RELOAD_INTERVAL:
+            # Another worker or the rotate job may have rotated already
+            self.load()
+            key=self.newest()
+            if not self.due(key):
+                return key
+        if self.autogenerate:
+            self.rotate()
+            return self.newest()
+        if key is None:
+            raise RuntimeError(
+                f"No {self.algorithm} JWT signing key in {self.directory.resolve()}: run "
+                "`python -m src.auth.keys rotate` against the directory shared by every host, "
+                "or set JWT_KEY_AUTOGENERATE=true on a single-host deployment"
+            )
+        if not self.overdue_warned:
+            logging.warning("JWT signing key %s is due for rotation, run `python -m src.auth.keys rotate`",key.kid)
+            self.overdue_warned=True
+        return key
+
+    def get(self,kid:str)->SigningKey | None:
+        key=self.keys.get(kid)
+        if key is None and time.time()-self.loaded_at>=RELOAD_INTERVAL:
+            self.load()
+            key=self.keys.get(kid)
+        return key
+
+    def jwks(self)->tuple[bytes,str]:
+        """Serialized JWKS and its ETag, refreshed at most every RELOAD_INTERVAL"""
+        if time.time()-self.loaded_at>=RELOAD_INTERVAL:
+            self.load()
+        return self.jwks_body,self.jwks_etag
+
+
+key_ring=KeyRing(
+    directory=Config.JWT_KEYS_DIR,
+    algorithm=Config.JWT_SIGNING_ALGORITHM,
+    rotation_days=Config.JWT_KEY_ROTATION_DAYS,
+    retention_days=Config.JWT_KEY_RETENTION_DAYS,
+    autogenerate=Config.JWT_KEY_AUTOGENERATE
+)
+
+
+if __name__=="__main__":
+    # python -m src.auth.keys rotate: add a signing key to JWT_KEYS_DIR and prune expired ones
+    if sys.argv[1:]!=["rotate"]:
+        sys.exit("usage: python -m src.auth.keys rotate")
+    logging.basicConfig(level=logging.INFO)
+    key_ring.rotate()
+    print(key_ring.newest().kid)
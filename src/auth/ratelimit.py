@@ -0,0 +1,160 @@
+from fastapi import Request
+from pyrate_limiter import Duration,Rate,RateItem,RedisBucket
+from redis.exceptions import NoScriptError,RedisError
+from src.db.redis import rate_limit_store
+from src.errors import RateLimitExceeded
+from src.config import Config
+import hashlib
+import logging
+import math
+import time
+import uuid
+
+KEY_PREFIX="ratelimit"
+
+# pyrate-limiter's PUT_ITEM over several buckets: the item goes into every
+# bucket or none, so a request turned away by one scope doesn't use up a
+# slot in the others. Per bucket ARGV holds the rate count followed by
+# (interval, limit) pairs. Returns -1 if accepted, else the 0-based
+# {bucket, rate} that was full.
+PUT_ITEMS="""
+local now = tonumber(ARGV[1])
+local item_name = ARGV[2]
+local offset = 3
+for k=1,#KEYS do
+    local rates_count = tonumber(ARGV[offset])
+    for i=1,rates_count do
+        local interval = tonumber(ARGV[offset + (i - 1) * 2 + 1])
+        local limit = tonumber(ARGV[offset + (i - 1) * 2 + 2])
+        if redis.call('ZCOUNT', KEYS[k], now - interval, now) >= limit then
+            return {k - 1, i - 1}
+        end
+    end
+    offset = offset + 1 + rates_count * 2
+end
+for k=1,#KEYS do
+    redis.call('ZADD', KEYS[k], now, item_name)
+end
+return -1
+"""
+
+
+class RateLimiter:
+    """Per-IP, per-email and global limits for one endpoint, kept in Redis.
+
+    Every scope is a pyrate-limiter bucket, and one EVALSHA checks them all
+    before adding the request to any, so a rejection costs nothing beyond
+    that. Accepted requests then trim and expire their buckets in one
+    pipelined round trip. If Redis is down the limiter lets requests
+    through rather than taking the endpoint with it.
+    """
+
+    def __init__(self,name:str,per_ip:list[Rate] | None=None,
+                 per_email:list[Rate] | None=None,
+                 global_rates:list[Rate] | None=None):
+        self.name=name
+        # Most specific first: when several are full, the first one sets Retry-After
+        self.scopes=[
+            ("ip",per_ip or []),
+            ("email",per_email or []),
+            ("global",global_rates or []),
+        ]
+
+    def bucket_key(self,scope:str,identity:str)->str:
+        return f"{KEY_PREFIX}:{self.name}:{scope}:{identity}"
+
+    async def put(self,buckets:list[tuple[list[Rate],str]],item:RateItem)->int:
+        """Returns 0 if the item fit every bucket, else the seconds until it would"""
+        args=[item.timestamp,f"{item.name}:{uuid.uuid4().hex}"]
+        for rates,_ in buckets:
+            args+=[len(rates),*[value for rate in rates for value in (rate.interval,rate.limit)]]
+        keys=[key for _,key in buckets]
+        try:
+            failed=await rate_limit_store.evalsha(await script_hash(),len(keys),*keys,*args)
+        except NoScriptError:
+            # Redis restarted or was flushed since we loaded the script
+            failed=await rate_limit_store.evalsha(await script_hash(reload=True),len(keys),*keys,*args)
+        if failed==-1:
+            await expire(buckets,item.timestamp)
+            return 0
+        rates,key=buckets[failed[0]]
+        bucket=RedisBucket(rates,rate_limit_store,key,await script_hash())
+        bucket.failing_rate=rates[failed[1]]
+        waiting=await bucket.waiting(item)
+        if waiting<0:
+            waiting=bucket.failing_rate.interval
+        return max(1,math.ceil(waiting/1000))
+
+    async def check(self,request:Request,email:str | None=None)->None:
+        if not Config.RATE_LIMIT_ENABLED:
+            return
+        identities={
+            "ip":request.client.host if request.client else "unknown",
+            "email":hashlib.sha256(email.strip().lower().encode()).hexdigest()[:32] if email else None,
+            "global":"all",
+        }
+        item=RateItem(self.name,int(time.time()*1000))
+        buckets=[
+            (rates,self.bucket_key(scope,identities[scope]))
+            for scope,rates in self.scopes if rates and identities[scope] is not None
+        ]
+        if not buckets:
+            return
+        try:
+            retry_after=await self.put(buckets,item)
+        except RedisError as e:
+            logging.warning("rate limiter %s unavailable, allowing request: %s",self.name,e)
+            return
+        if retry_after:
+            raise RateLimitExceeded(retry_after)
+
+
+_script_hash:str | None=None
+
+
+async def script_hash(reload:bool=False)->str:
+    global _script_hash
+    if _script_hash is None or reload:
+        _script_hash=await rate_limit_store.script_load(PUT_ITEMS)
+    return _script_hash
+
+
+async def expire(buckets:list[tuple[list[Rate],str]],now:int)->None:
+    try:
+        async with rate_limit_store.pipeline(transaction=False) as pipe:
+            for rates,key in buckets:
+                longest=max(rate.interval for rate in rates)
+                pipe.zremrangebyscore(key,0,now-longest)
+                pipe.pexpire(key,longest)
+            await pipe.execute()
+    except RedisError as e:
+        logging.warning("rate limiter cleanup failed for %s: %s",", ".join(key for _,key in buckets),e)
+
+
+# Logins burn a bcrypt verify each, signup and reset requests each send a mail
+login_limiter=RateLimiter(
+    "login",
+    per_ip=[Rate(Config.LOGIN_RATE_PER_IP,Duration.MINUTE)],
+    per_email=[Rate(Config.LOGIN_RATE_PER_EMAIL,Duration.MINUTE)],
+    global_rates=[Rate(Config.LOGIN_RATE_GLOBAL,Duration.SECOND)]
+)
+
+signup_limiter=RateLimiter(
+    "signup",
+    per_ip=[Rate(Config.EMAIL_RATE_PER_IP,Duration.MINUTE)],
+    per_email=[Rate(Config.EMAIL_RATE_PER_ADDRESS,Duration.HOUR)],
+    global_rates=[Rate(Config.EMAIL_RATE_GLOBAL,Duration.SECOND)]
+)
+
+password_reset_limiter=RateLimiter(
+    "password-reset",
+    per_ip=[Rate(Config.EMAIL_RATE_PER_IP,Duration.MINUTE)],
+    per_email=[Rate(Config.EMAIL_RATE_PER_ADDRESS,Duration.HOUR)],
+    global_rates=[Rate(Config.EMAIL_RATE_GLOBAL,Duration.SECOND)]
+)
+
+send_mail_limiter=RateLimiter(
+    "send-mail",
+    per_ip=[Rate(Config.EMAIL_RATE_PER_IP,Duration.MINUTE)],
+    global_rates=[Rate(Config.EMAIL_RATE_GLOBAL,Duration.SECOND)]
+)
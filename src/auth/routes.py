@@ -1,15 +1,17 @@
-from fastapi import APIRouter,Depends,HTTPException,status
-from fastapi.responses import JSONResponse
+from fastapi import APIRouter,Depends,HTTPException,Request,status
+from fastapi.responses import JSONResponse,Response
 from .schemas import UserCreateModel,UserModel,UserLoginModel,EmailSchema,PasswordResetSchema,PasswordResetConfirmSchema
 from .service import AuthService
 from src.db.main import get_session
 from sqlmodel.ext.asyncio.session import AsyncSession
-from .utils import create_access_token,decode_token,verify_password,create_url_safe_token,decode_url_safe_token,generate_password_hash
+from .utils import create_access_token,decode_token,verify_and_update_password,create_url_safe_token,decode_url_safe_token,generate_password_hash_async
 from datetime import timedelta,datetime
 from fastapi.responses import JSONResponse
+from .keys import key_ring
+from .ratelimit import login_limiter,signup_limiter,password_reset_limiter,send_mail_limiter
 from .dependencies import RefreshTokenBearer,AccessTokenBearer,get_current_user,RoleChecker
-from src.db.redis import add_jti_to_blocklist
-from src.mail import mail,create_message
+from src.db.redis import add_jti_to_blocklist,bump_token_generation,current_token_generation
+from src.email.service import outbox_service
 from src.config import Config
 from src.errors import UserNotFound,InvalidCredentials,InsufficientPermission,InvalidToken,RefreshTokenRequired
 
@@ -21,30 +23,33 @@ role_checker=RoleChecker(['admin','user'])
 REFRESH_TOKEN_EXPIRY=2
 
 @auth_router.post("/send_mail")
-async def send_mail(emails:EmailSchema):
+async def send_mail(emails:EmailSchema,request:Request,session:AsyncSession=Depends(get_session)):
+    await send_mail_limiter.check(request)
     emails=emails.addresses
     html="<h1>welcome to Task Collabration App</h1>"
-    message=create_message(
+    outbox_service.enqueue(
+        session,
         recipients=emails,
         subject="Welcome",
         body=html
     )
-    await mail.send_message(message)
+    await session.commit()
     return {"message":"Email sent successfully"}
 
 @auth_router.post("/signup",status_code=status.HTTP_201_CREATED)
-async def create_user(user_data:UserCreateModel,session:AsyncSession=Depends(get_session)):
+async def create_user(user_data:UserCreateModel,request:Request,session:AsyncSession=Depends(get_session)):
     email=user_data.email
+    await signup_limiter.check(request,email)
 
     user_exists=await user_service.user_exists(email,session)
     if user_exists:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN,detail="User with email already exists")
-    new_user=await user_service.create_user(user_data,session)
     token=create_url_safe_token({"email":email})
     link=f"http://{Config.DOMAIN}/api/v1/auth/verify/{token}"
     html_message=f"""<h1>Verify your email</h1><p>Please click this <a href='{link}'>link</a> to verify your email"""
-    message=create_message(recipients=[email],subject="Verify Your Email",body=html_message)
-    await mail.send_message(message)
+    # Committed together with the new user by create_user
+    outbox_service.enqueue(session,recipients=[email],subject="Verify Your Email",body=html_message)
+    new_user=await user_service.create_user(user_data,session)
     return {"message":"Account created! Check email to verify your account",
             "user":new_user
             }
@@ -69,25 +74,32 @@ async def verify_user_account(token:str,session:AsyncSession=Depends(get_session
 
 @auth_router.post("/login")
 async def login_users(
-    login_data: UserLoginModel, session: AsyncSession = Depends(get_session)
+    login_data: UserLoginModel, request: Request, session: AsyncSession = Depends(get_session)
 ):
     email = login_data.email
     password = login_data.password
+    await login_limiter.check(request, email)
 
     user = await user_service.get_user_by_email(email, session)
 
     if user is not None:
-        password_valid = verify_password(password, user.password_hash)
+        password_valid, new_hash = await verify_and_update_password(password, user.password_hash)
 
         if password_valid:
+            if new_hash:
+                # BCRYPT_ROUNDS changed since this hash was made
+                await user_service.update_user(user, {"password_hash": new_hash}, session)
+            generation = await current_token_generation(str(user.uid))
             access_token = create_access_token(
-                user_data={"email": user.email, "user_uid": str(user.uid),"role":user.role}
+                user_data={"email": user.email, "user_uid": str(user.uid),"role":user.role},
+                generation=generation
             )
 
             refresh_token = create_access_token(
-                user_data={"email": user.email, "user_uid": str(user.uid)},
+                user_data={"email": user.email, "user_uid": str(user.uid),"role":user.role},
                 refresh=True,
                 expiry=timedelta(days=REFRESH_TOKEN_EXPIRY),
+                generation=generation
             )
 
             return JSONResponse(
@@ -106,7 +118,7 @@ async def get_new_access_token(token_details:dict=Depends(RefreshTokenBearer()))
     expiry_timestamp=token_details['exp']
     print(expiry_timestamp)
     if datetime.fromtimestamp(expiry_timestamp)>datetime.now():
-        new_access_token=create_access_token(user_data=token_details['user'])
+        new_access_token=create_access_token(user_data=token_details['user'],generation=token_details.get('gen',0))
         return JSONResponse(content={
             "access_token":new_access_token
         })
@@ -119,25 +131,42 @@ async def get_current_user(user=Depends(get_current_user),_:bool=Depends(role_ch
 @auth_router.get("/logout")
 async def revoke_token(token_details:dict=Depends(AccessTokenBearer())):
     jti=token_details['jti']
-    await add_jti_to_blocklist(jti)
+    await add_jti_to_blocklist(jti,token_details['exp'])
 
     return JSONResponse(content={"message":"Logout successfully"},status_code=status.HTTP_200_OK)
 
+@auth_router.get("/logout_all")
+async def revoke_all_tokens(token_details:dict=Depends(AccessTokenBearer())):
+    """Sign the user out of every session by bumping their token generation"""
+    await bump_token_generation(token_details['user']['user_uid'])
+
+    return JSONResponse(content={"message":"Logged out of all sessions"},status_code=status.HTTP_200_OK)
+
+@auth_router.get("/.well-known/jwks.json")
+async def get_jwks(request:Request):
+    """Public signing keys, so other services can verify our tokens offline"""
+    body,etag=key_ring.jwks()
+    headers={"Cache-Control":"public, max-age=300","ETag":etag}
+    if request.headers.get("if-none-match")==etag:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED,headers=headers)
+    return Response(content=body,media_type="application/jwk-set+json",headers=headers)
+
 """
 1.provide the email ->pasword reset request
 2.send password reset link
 3.reset password-> password  reset confirm
 """
 @auth_router.post('/password-reset-request')
-async def password_reset_request(email_data:PasswordResetSchema,session: AsyncSession = Depends(get_session)):
+async def password_reset_request(email_data:PasswordResetSchema,request:Request,session: AsyncSession = Depends(get_session)):
     email=email_data.email
+    await password_reset_limiter.check(request,email)
  
     token=create_url_safe_token({"email":email})
    # In your password-reset-request endpoint
     link = f"http://localhost:3000/reset-password/{token}"  # Match your frontend route  # or your frontend domain
     html_message=f"""<h1>Reset Your Password</h1><p>Please click this <a href='{link}'>link</a> to Reset your password"""
-    message=create_message(recipients=[email],subject="Reset Your Password",body=html_message)
-    await mail.send_message(message)
+    outbox_service.enqueue(session,recipients=[email],subject="Reset Your Password",body=html_message)
+    await session.commit()
     return JSONResponse(content={"message":"Please checj your email for instructionsto reset password",
             },status_code=status.HTTP_200_OK)
 
@@ -155,8 +184,10 @@ async def reset_account_password(token:str,passwords:PasswordResetConfirmSchema,
         user=await user_service.get_user_by_email(user_email,session)
         if not user:
             raise UserNotFound()
-        password_hash=generate_password_hash(new_password)
+        password_hash=await generate_password_hash_async(new_password)
         await user_service.update_user(user,{'password_hash':password_hash},session)
+        # Sessions opened with the old password must not survive the reset
+        await bump_token_generation(str(user.uid))
 
         return JSONResponse(content={
             "message":"Password has been successfully verified",
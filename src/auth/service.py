@@ -2,12 +2,22 @@ from .models import User
 from sqlmodel import select
 from sqlmodel.ext.asyncio.session import AsyncSession
 from .schemas import UserCreateModel
-from .utils import generate_password_hash,verify_password
+from .utils import generate_password_hash_async
+from .cache import user_cache
+from src.tasks.cache import task_cache
+from src.tasks.models import Tasks
+from src.tracing import traced
 class AuthService:
+    @traced()
     async def get_user_by_email(self,email:str,session:AsyncSession):
+        user=user_cache.get_by_email(email)
+        if user is not None:
+            return user
         statement=select(User).where(User.email==email)
         result=await session.exec(statement)
         user=result.first()
+        if user is not None:
+            user_cache.put(user)
         return user
     async def user_exists(self,email:str,session:AsyncSession):
         user=await self.get_user_by_email(email,session)
@@ -16,26 +26,85 @@ class AuthService:
         else:
             return True
     
+    @traced()
     async def create_user(self,user_data:UserCreateModel,session:AsyncSession):
         user_data_dict=user_data.model_dump()
         new_user=User( 
             **user_data_dict 
             )
-        new_user.password_hash=generate_password_hash(user_data_dict['password'])
+        new_user.password_hash=await generate_password_hash_async(user_data_dict['password'])
         new_user.role=user_data_dict['role']
         session.add(new_user)
         await session.commit()
+        await user_cache.publish_invalidation(new_user.uid,new_user.email)
 
         return new_user
     
+    @traced()
     async def update_user(self,user:User,user_data:dict,session:AsyncSession):
+        # Cached users may be stale snapshots: write only user_data onto the current row
+        old_email=user.email
+        user=await session.get(User,user.uid,populate_existing=True)
+        if user is None:
+            return None
+        shown=(user.email,user.firstname)
         for k,v in user_data.items():
             setattr(user,k,v)
         await session.commit()
+        await user_cache.publish_invalidation(user.uid,old_email)
+        if (user.email,user.firstname)!=shown:
+            # Cached task bodies carry the assignee's email and first name
+            statement=select(Tasks.uid,Tasks.created_by).where(Tasks.assigned_to==user.uid)
+            assigned=(await session.exec(statement)).all()
+            if assigned:
+                await task_cache.invalidate_many([(uid,created_by,user.uid) for uid,created_by in assigned])
 
         return user
     
+    @traced()
     async def get_user_by_uid(self, uid: str, session: AsyncSession):
+        user = user_cache.get_by_uid(uid)
+        if user is not None:
+            return user
         statement = select(User).where(User.uid == uid)
         result = await session.exec(statement)
-        return result.first()
+        user = result.first()
+        if user is not None:
+            user_cache.put(user)
+        return user
+
+    @traced()
+    async def get_users_by_uids(self, uids, session: AsyncSession) -> dict:
+        """Resolve many users in a single IN (...) query, keyed by uid"""
+        uids = {uid for uid in uids if uid is not None}
+        if not uids:
+            return {}
+        users = {}
+        for uid in uids:
+            user = user_cache.get_by_uid(uid)
+            if user is not None:
+                users[user.uid] = user
+        missing = uids - users.keys()
+        if missing:
+            statement = select(User).where(User.uid.in_(missing))
+            result = await session.exec(statement)
+            for user in result.all():
+                users[user.uid] = user_cache.put(user)
+        return users
+
+    @traced()
+    async def get_users_by_emails(self, emails, session: AsyncSession) -> dict:
+        """Resolve many users in a single IN (...) query, keyed by email"""
+        emails = {email for email in emails if email}
+        users = {}
+        for email in emails:
+            user = user_cache.get_by_email(email)
+            if user is not None:
+                users[email] = user
+        missing = emails - users.keys()
+        if missing:
+            statement = select(User).where(User.email.in_(missing))
+            result = await session.exec(statement)
+            for user in result.all():
+                users[user.email] = user_cache.put(user)
+        return users
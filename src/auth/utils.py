@@ -5,13 +5,23 @@ import jwt
 from src.config import Config
 import uuid
 import logging
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from itsdangerous import URLSafeTimedSerializer
+from .cache import claims_cache
+from .keys import key_ring
 ACCESS_TOKEN_EXPIRY=3600
 password_context=CryptContext(
-    schemes=['bcrypt']
+    schemes=['bcrypt'],
+    bcrypt__rounds=Config.BCRYPT_ROUNDS
 
 )
 
+# bcrypt releases the GIL, so hashing runs in threads instead of on the event
+# loop; the semaphore makes login bursts queue rather than pile onto the pool
+hash_executor=ThreadPoolExecutor(max_workers=Config.PASSWORD_HASH_WORKERS,thread_name_prefix="bcrypt")
+hash_semaphore=asyncio.Semaphore(Config.PASSWORD_HASH_WORKERS)
+
 
 def generate_password_hash(password:str)->str:
     hash=password_context.hash(password)
@@ -20,32 +30,67 @@ def generate_password_hash(password:str)->str:
 def verify_password(password:str,hash:str)->bool:
     return password_context.verify(password,hash)
 
-def create_access_token(user_data:dict,expiry:timedelta=None,refresh:bool=False):
+async def run_hashing(func,*args):
+    async with hash_semaphore:
+        return await asyncio.get_running_loop().run_in_executor(hash_executor,func,*args)
+
+async def generate_password_hash_async(password:str)->str:
+    return await run_hashing(generate_password_hash,password)
+
+async def verify_and_update_password(password:str,hash:str)->tuple[bool,str | None]:
+    """Verify off the event loop; also returns a new hash if BCRYPT_ROUNDS changed"""
+    return await run_hashing(password_context.verify_and_update,password,hash)
+
+def create_access_token(user_data:dict,expiry:timedelta=None,refresh:bool=False,generation:int=0):
     payload={}
     payload['user']=user_data
+    payload['gen']=generation
     payload['exp']=datetime.now()+(expiry if expiry is not None else timedelta(minutes=ACCESS_TOKEN_EXPIRY))
-    payload['jti']=str(uuid.uuid4)
+    payload['jti']=str(uuid.uuid4())
     payload['refresh']=refresh
+    signing_key=key_ring.active()
     token=jwt.encode(
         payload=payload,
-        key=Config.JWT_SECRET,
-        algorithm=Config.JWT_ALGORITHM
+        key=signing_key.private_key,
+        algorithm=signing_key.algorithm,
+        headers={"kid":signing_key.kid}
     )
 
     return token
 
 def decode_token(token:str)->dict:
     try:
+        kid=jwt.get_unverified_header(token).get("kid")
+        if kid is None:
+            # Issued with the shared secret before the move to asymmetric keys
+            if not Config.JWT_ACCEPT_LEGACY_TOKENS:
+                raise jwt.InvalidTokenError("Legacy tokens are no longer accepted")
+            key,algorithms=Config.JWT_SECRET,[Config.JWT_ALGORITHM]
+        else:
+            signing_key=key_ring.get(kid)
+            if signing_key is None:
+                raise jwt.InvalidTokenError(f"Unknown signing key {kid}")
+            # Pin the algorithm to the key so the header can't pick a weaker one
+            key,algorithms=signing_key.public_key,[signing_key.algorithm]
         token_data=jwt.decode(
             jwt=token,
-            key=Config.JWT_SECRET,
-            algorithms=[Config.JWT_ALGORITHM]
+            key=key,
+            algorithms=algorithms
         )
         return token_data
     
     except jwt.PyJWTError as e:
         logging.exception(e)
         return None
+
+def decode_token_cached(token:str)->dict:
+    """decode_token, verifying each distinct token only once until it expires"""
+    token_data=claims_cache.get(token)
+    if token_data is None:
+        token_data=decode_token(token)
+        if token_data is not None:
+            claims_cache.put(token,token_data)
+    return token_data
 serializer=URLSafeTimedSerializer(secret_key=Config.JWT_SECRET,salt="email-configuration")
 
 def create_url_safe_token(data:dict):
@@ -0,0 +1,42 @@
+from fastapi import APIRouter,WebSocket,status
+from typing import Optional
+from src.auth.utils import decode_token_cached
+from src.db.redis import token_revoked
+from .service import Connection,collaboration_service
+
+collaboration_router=APIRouter()
+
+
+def bearer_token(websocket:WebSocket,token:Optional[str])->Optional[str]:
+    # Browsers can't set headers on a WebSocket, so ?token= is accepted too
+    if token:
+        return token
+    scheme,_,credentials=websocket.headers.get("authorization","").partition(" ")
+    return credentials if scheme.lower()=="bearer" and credentials else None
+
+
+@collaboration_router.websocket("/ws")
+async def task_events(websocket:WebSocket,token:Optional[str]=None):
+    """Push task.created/task.updated/task.deleted events for tasks the caller
+    created or is (or was) assigned to. Authenticate with an access token as
+    `?token=` or an `Authorization: Bearer` header."""
+    credentials=bearer_token(websocket,token)
+    token_data=decode_token_cached(credentials) if credentials else None
+    if (
+        token_data is None
+        or token_data['refresh']
+        or await token_revoked(token_data['jti'],token_data['user']['user_uid'],token_data.get('gen',0))
+    ):
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION,reason="Invalid, expired or revoked access token")
+        return
+    if collaboration_service.full():
+        await websocket.close(code=status.WS_1013_TRY_AGAIN_LATER,reason="Too many connections")
+        return
+
+    await websocket.accept()
+    connection=Connection(websocket,token_data)
+    collaboration_service.register(connection)
+    try:
+        await connection.run()
+    finally:
+        collaboration_service.unregister(connection)
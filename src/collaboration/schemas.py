@@ -0,0 +1,15 @@
+from pydantic import BaseModel, TypeAdapter
+from typing import Optional
+import uuid
+from datetime import datetime
+from src.tasks.schemas import TaskResponseSchema
+from .utils import TaskEventType
+
+class TaskEventSchema(BaseModel):
+    type: TaskEventType
+    task_uid: uuid.UUID
+    task: Optional[TaskResponseSchema] = None  # Omitted for deletes and for a previous assignee
+    at: datetime
+
+
+task_event_adapter = TypeAdapter(TaskEventSchema)
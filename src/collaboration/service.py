@@ -0,0 +1,166 @@
+from fastapi import WebSocket,status
+from redis.exceptions import RedisError
+from datetime import datetime
+from src.db.redis import token_blocklist,token_revoked
+from src.config import Config
+from src.metrics import websocket_connections,websocket_events
+from .schemas import task_event_adapter
+from .utils import TaskEventType
+import asyncio
+import json
+import logging
+import time
+
+TASK_EVENTS_CHANNEL="collab:task-events"
+
+
+class Connection:
+    """One subscriber socket with a bounded send buffer.
+
+    The listener only queues events, send_loop() writes them. A client that
+    lets WS_SEND_BUFFER events pile up is closed with 1013 instead of being
+    buffered without limit; it should reconnect and refetch GET /tasks/.
+    The socket is also closed once its token expires or is revoked; the
+    blocklist is checked before every send and, on an idle socket, every
+    WS_REVOCATION_CHECK_INTERVAL seconds.
+    """
+
+    def __init__(self,websocket:WebSocket,claims:dict):
+        self.websocket=websocket
+        self.user_uid=claims['user']['user_uid']
+        self.jti=claims['jti']
+        self.generation=claims.get('gen',0)
+        self.expires_at=float(claims['exp'])
+        self.queue:asyncio.Queue[str | None]=asyncio.Queue(maxsize=Config.WS_SEND_BUFFER)
+
+    def offer(self,text:str)->None:
+        try:
+            self.queue.put_nowait(text)
+            websocket_events.labels("queued").inc()
+        except asyncio.QueueFull:
+            # Drop the backlog, the None tells send_loop to close the socket
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(None)
+            websocket_events.labels("overflow").inc()
+
+    async def send_loop(self)->None:
+        while True:
+            timeout=min(max(self.expires_at-time.time(),0),Config.WS_REVOCATION_CHECK_INTERVAL)
+            try:
+                text=await asyncio.wait_for(self.queue.get(),timeout)
+            except TimeoutError:
+                if time.time()>=self.expires_at:
+                    await self.websocket.close(code=status.WS_1008_POLICY_VIOLATION,reason="Token expired")
+                    return
+                # Nothing to send, but still look at the blocklist
+                text=""
+            if text is None:
+                await self.websocket.close(code=status.WS_1013_TRY_AGAIN_LATER,reason="Too many unsent events")
+                return
+            if await token_revoked(self.jti,self.user_uid,self.generation):
+                await self.websocket.close(code=status.WS_1008_POLICY_VIOLATION,reason="Token revoked")
+                return
+            if text:
+                await asyncio.wait_for(self.websocket.send_text(text),Config.WS_SEND_TIMEOUT)
+
+    async def receive_loop(self)->None:
+        # Nothing is expected from the client, read only to notice it leaving
+        while (await self.websocket.receive())["type"]!="websocket.disconnect":
+            pass
+
+    async def run(self)->None:
+        """Until the client disconnects or send_loop closes the socket"""
+        tasks={asyncio.create_task(self.send_loop()),asyncio.create_task(self.receive_loop())}
+        try:
+            done,_=await asyncio.wait(tasks,return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for task in tasks:
+                task.cancel()
+        for task in done:
+            if not task.cancelled() and task.exception() is not None:
+                logging.debug("websocket for %s closed: %r",self.user_uid,task.exception())
+
+
+class CollaborationService:
+    """Pushes task events to the users they concern over WebSockets.
+
+    Writers publish after their commit to TASK_EVENTS_CHANNEL, and every
+    uvicorn worker's listen() task hands each event to its own sockets for
+    the recipients, whichever worker handled the write. An event is encoded
+    once per worker, not once per socket. Delivery is best effort: anything
+    published while a worker is resubscribing is lost, so clients refetch
+    after they reconnect.
+    """
+
+    def __init__(self,max_connections:int=Config.WS_MAX_CONNECTIONS):
+        self.connections:dict[str,set[Connection]]={}
+        self.count=0
+        self.max_connections=max_connections
+
+    def full(self)->bool:
+        return self.count>=self.max_connections
+
+    def register(self,connection:Connection)->None:
+        self.connections.setdefault(connection.user_uid,set()).add(connection)
+        self.count+=1
+        websocket_connections.inc()
+
+    def unregister(self,connection:Connection)->None:
+        peers=self.connections.get(connection.user_uid)
+        if peers is None or connection not in peers:
+            return
+        peers.discard(connection)
+        if not peers:
+            del self.connections[connection.user_uid]
+        self.count-=1
+        websocket_connections.dec()
+
+    def dispatch(self,recipients:list[str],text:str)->None:
+        for user_uid in recipients:
+            for connection in self.connections.get(user_uid,()):
+                connection.offer(text)
+
+    @staticmethod
+    def task_event(event_type:TaskEventType,task_uid,recipients,task:dict | None=None)->dict:
+        """Event for the given users; task is the hydrated body, None to leave it out"""
+        event=task_event_adapter.validate_python(
+            {"type":event_type,"task_uid":task_uid,"task":task,"at":datetime.now()}
+        )
+        return {
+            "recipients":sorted({str(uid) for uid in recipients if uid is not None}),
+            "event":task_event_adapter.dump_python(event,mode="json")
+        }
+
+    async def publish(self,events:list[dict])->None:
+        """One message per write, however many tasks it touched"""
+        if not events:
+            return
+        try:
+            await token_blocklist.publish(TASK_EVENTS_CHANNEL,json.dumps(events))
+        except RedisError as e:
+            # The write is committed, a missed push only means a stale client
+            logging.warning("task events not published: %s",e)
+
+    async def listen(self)->None:
+        """Background task delivering every worker's task events to this worker's sockets"""
+        while True:
+            pubsub=token_blocklist.pubsub()
+            try:
+                await pubsub.subscribe(TASK_EVENTS_CHANNEL)
+                async for message in pubsub.listen():
+                    if message["type"]!="message":
+                        continue
+                    for event in json.loads(message["data"]):
+                        if any(user_uid in self.connections for user_uid in event["recipients"]):
+                            self.dispatch(event["recipients"],json.dumps(event["event"]))
+            except asyncio.CancelledError:
+                raise
+            except (RedisError,ValueError,KeyError) as e:
+                logging.warning("task event subscriber disconnected: %s",e)
+                await asyncio.sleep(1)
+            finally:
+                await pubsub.aclose()
+
+
+collaboration_service=CollaborationService()
@@ -0,0 +1,7 @@
+from enum import Enum
+
+
+class TaskEventType(str, Enum):
+    created = "task.created"
+    updated = "task.updated"
+    deleted = "task.deleted"
@@ -8,10 +8,51 @@ TEMPLATE_FOLDER = BASE_DIR / "templates"
 
 class Settings(BaseSettings):
     DATABASE_URL:str
+    DB_ECHO:bool=False
+    DB_POOL_SIZE:int=10
+    DB_MAX_OVERFLOW:int=10
+    DB_POOL_TIMEOUT:float=30.0
+    DB_POOL_RECYCLE:int=1800
+    DB_POOL_PRE_PING:bool=True
+    DB_STATEMENT_CACHE_SIZE:int=100
+    DB_QUERY_DEBUG:bool=False
+    DB_N_PLUS_ONE_THRESHOLD:int=3
+    SLOW_QUERY_THRESHOLD_MS:float=200.0
+    SLOW_QUERY_BUFFER_SIZE:int=200
+    # EXPLAIN ANALYZE re-runs the query, keep this low in production
+    SLOW_QUERY_EXPLAIN_SAMPLE_RATE:float=0.0
+    SLOW_QUERY_EXPLAIN_TIMEOUT_MS:int=5000
+    TRACING_ENABLED:bool=False
+    TRACING_SAMPLE_RATE:float=1.0
+    TRACING_EXPORTER:str="memory"
+    TRACING_FILE:str="traces.jsonl"
+    TRACING_MEMORY_LIMIT:int=1000
+    PROFILING_ENABLED:bool=False
+    PROFILING_SAMPLE_RATE:float=0.0
+    PROFILING_INTERVAL:float=0.001
+    PROFILING_DIR:str="profiles"
     JWT_SECRET:str
     JWT_ALGORITHM:str
+    JWT_SIGNING_ALGORITHM:str="EdDSA"
+    # Must be the same directory on every host (shared volume or mounted secret),
+    # tokens signed with a key a host can't see are rejected there
+    JWT_KEYS_DIR:str="keys"
+    # Single-host only: let workers create and rotate keys in JWT_KEYS_DIR themselves
+    JWT_KEY_AUTOGENERATE:bool=False
+    JWT_KEY_ROTATION_DAYS:int=30
+    JWT_KEY_RETENTION_DAYS:int=7
+    # Keep verifying JWT_SECRET/JWT_ALGORITHM tokens until they have all expired
+    JWT_ACCEPT_LEGACY_TOKENS:bool=True
     REDIS_HOST:str="localhost"
     REDIS_PORT:int=6379
+    TASK_CACHE_TTL:int=300
+    USER_CACHE_SIZE:int=10000
+    USER_CACHE_TTL:int=60
+    TOKEN_CACHE_SIZE:int=10000
+    # Quiet blocklist subscriptions are pinged this often; a missed PONG drops the mirror
+    BLOCKLIST_HEARTBEAT_INTERVAL:float=5.0
+    BCRYPT_ROUNDS:int=12
+    PASSWORD_HASH_WORKERS:int=4
     model_config=SettingsConfigDict(
         env_file=".env",
         extra="ignore"
@@ -27,6 +68,29 @@ class Settings(BaseSettings):
     USE_CREDENTIALS: bool = True
     VALIDATE_CERTS: bool = True
     DOMAIN:str
+    MAIL_POOL_SIZE:int=4
+    MAIL_POOL_MAX_MESSAGES:int=100
+    MAIL_POOL_IDLE_TIMEOUT:float=30.0
+    MAIL_RATE_LIMIT:float=10.0
+    OUTBOX_WORKER_ENABLED:bool=True
+    OUTBOX_POLL_INTERVAL:float=1.0
+    OUTBOX_BATCH_SIZE:int=50
+    OUTBOX_MAX_ATTEMPTS:int=8
+    OUTBOX_BACKOFF_BASE:int=5
+    OUTBOX_BACKOFF_MAX:int=3600
+    OUTBOX_LEASE_SECONDS:int=300
+    RATE_LIMIT_ENABLED:bool=True
+    LOGIN_RATE_PER_IP:int=20
+    LOGIN_RATE_PER_EMAIL:int=5
+    LOGIN_RATE_GLOBAL:int=20
+    EMAIL_RATE_PER_IP:int=5
+    EMAIL_RATE_PER_ADDRESS:int=3
+    EMAIL_RATE_GLOBAL:int=10
+    WS_MAX_CONNECTIONS:int=10000
+    WS_SEND_BUFFER:int=64
+    WS_SEND_TIMEOUT:float=10.0
+    # Idle sockets re-check their token against the blocklist this often
+    WS_REVOCATION_CHECK_INTERVAL:float=30.0
 
 
 
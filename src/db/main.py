@@ -1,14 +1,36 @@
 from src.config import Config
-from sqlalchemy.ext.asyncio import AsyncEngine
-from sqlmodel import create_engine,SQLModel
+from sqlalchemy.ext.asyncio import create_async_engine,async_sessionmaker
+from sqlmodel import SQLModel
 from sqlmodel.ext.asyncio.session import AsyncSession
-from sqlalchemy.orm import sessionmaker
+from .metrics import InstrumentedAsyncPool,instrument_engine
 
-async_engine=AsyncEngine(
-    create_engine(
-        url=Config.DATABASE_URL,
-        echo=True
+
+def engine_options()->dict:
+    """Engine profile from Settings, echo is off unless DB_ECHO is set"""
+    options=dict(
+        echo=Config.DB_ECHO,
+        poolclass=InstrumentedAsyncPool,
+        pool_size=Config.DB_POOL_SIZE,
+        max_overflow=Config.DB_MAX_OVERFLOW,
+        pool_timeout=Config.DB_POOL_TIMEOUT,
+        pool_recycle=Config.DB_POOL_RECYCLE,
+        pool_pre_ping=Config.DB_POOL_PRE_PING,
     )
+    if "+asyncpg" in Config.DATABASE_URL:
+        # Set to 0 behind pgbouncer in transaction pooling mode
+        options["connect_args"]={
+            "prepared_statement_cache_size":Config.DB_STATEMENT_CACHE_SIZE,
+            "statement_cache_size":Config.DB_STATEMENT_CACHE_SIZE,
+        }
+    return options
+
+
+async_engine=create_async_engine(Config.DATABASE_URL,**engine_options())
+instrument_engine(async_engine)
+
+# Built once per process, not per request
+async_session_maker=async_sessionmaker(
+    bind=async_engine, class_=AsyncSession, expire_on_commit=False
 )
 
 
@@ -18,9 +40,5 @@ async def init_db():
 
 async def get_session() -> AsyncSession:
     """Dependency to provide the session object"""
-    async_session = sessionmaker(
-        bind=async_engine, class_=AsyncSession, expire_on_commit=False
-    )
-
-    async with async_session() as session:
-        yield session
\ No newline at end of file
+    async with async_session_maker() as session:
+        yield session
@@ -0,0 +1,140 @@
+from sqlalchemy import event,exc
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from starlette.datastructures import MutableHeaders
+from src.config import Config
+from src.metrics import RequestMetrics,current_request,observe_statement
+from src.metrics import db_pool_capacity,db_pool_checked_out,db_pool_checkout_timeouts,db_pool_checkout_wait,db_pool_overflow
+from src.tracing import tracer,current_span
+from .slowlog import slow_query_log
+import logging
+import time
+
+
+def pool_state(pool)->dict:
+    """Live checkout counts of one worker's pool; wait times are on /metrics"""
+    capacity=pool.size()+max(pool._max_overflow,0)
+    checked_out=pool.checkedout()
+    return {
+        "pool_size":pool.size(),
+        "max_overflow":pool._max_overflow,
+        "checked_out":checked_out,
+        "idle":pool.checkedin(),
+        "overflow":max(pool.overflow(),0),
+        "saturation":round(checked_out/capacity,4) if capacity>0 else 0.0,
+    }
+
+
+class InstrumentedAsyncPool(AsyncAdaptedQueuePool):
+    """QueuePool exporting checkout wait times and connection usage to Prometheus"""
+
+    def __init__(self,*args,**kwargs):
+        super().__init__(*args,**kwargs)
+        db_pool_capacity.set(self.size()+max(self._max_overflow,0))
+
+    def _do_get(self):
+        start=time.perf_counter()
+        try:
+            connection=super()._do_get()
+        except exc.TimeoutError:
+            db_pool_checkout_timeouts.inc()
+            raise
+        db_pool_checkout_wait.observe(time.perf_counter()-start)
+        self.observe_usage()
+        return connection
+
+    def _do_return_conn(self,record):
+        super()._do_return_conn(record)
+        self.observe_usage()
+
+    def observe_usage(self)->None:
+        db_pool_checked_out.set(self.checkedout())
+        db_pool_overflow.set(max(self.overflow(),0))
+
+
+STATEMENT_OPERATIONS={"SELECT","INSERT","UPDATE","DELETE"}
+
+
+def instrument_engine(engine:AsyncEngine)->None:
+    """Time every statement, count it against the request that issued it, trace it and log it if slow"""
+    slow_query_log.engine=engine
+
+    @event.listens_for(engine.sync_engine,"before_cursor_execute")
+    def before_cursor_execute(conn,cursor,statement,parameters,context,executemany):
+        conn.info.setdefault("statement_start",[]).append(time.perf_counter())
+        parent=current_span.get()
+        conn.info.setdefault("statement_span",[]).append(
+            tracer.start_span("db.query",parent,{"statement":" ".join(statement.split())[:300]})
+            if parent is not None else None
+        )
+
+    @event.listens_for(engine.sync_engine,"after_cursor_execute")
+    def after_cursor_execute(conn,cursor,statement,parameters,context,executemany):
+        elapsed=time.perf_counter()-conn.info["statement_start"].pop()
+        span=conn.info["statement_span"].pop()
+        if span is not None:
+            tracer.finish(span)
+        operation=statement.lstrip().split(None,1)[0].upper() if statement.strip() else ""
+        observe_statement(operation if operation in STATEMENT_OPERATIONS else "OTHER",elapsed,statement,parameters)
+        slow_query_log.observe(statement,parameters,elapsed)
+
+
+class QueryDebugMiddleware:
+    """Opt-in (DB_QUERY_DEBUG) per-request SQL accounting.
+
+    Adds X-DB-Queries and X-DB-Time (milliseconds) to every response so tests
+    can assert a query budget per route, and logs any statement that ran with
+    DB_N_PLUS_ONE_THRESHOLD or more different parameter sets as an N+1 loop.
+    Statements issued after the response has started, e.g. while streaming an
+    export, are logged but miss the headers.
+    """
+
+    def __init__(self,app):
+        self.app=app
+
+    async def __call__(self,scope,receive,send):
+        if scope["type"]!="http":
+            await self.app(scope,receive,send)
+            return
+        stats=current_request.get()
+        token=None
+        if stats is None:
+            stats=RequestMetrics(route=f"{scope['method']} {scope['path']}")
+            token=current_request.set(stats)
+        stats.track_statements=True
+        threshold=Config.DB_N_PLUS_ONE_THRESHOLD
+
+        async def send_wrapper(message):
+            if message["type"]=="http.response.start":
+                headers=MutableHeaders(scope=message)
+                headers["X-DB-Queries"]=str(stats.statements)
+                headers["X-DB-Time"]=f"{stats.statement_time*1000:.3f}"
+                repeated=stats.repeated(threshold)
+                if repeated:
+                    headers["X-DB-N-Plus-One"]=str(len(repeated))
+            await send(message)
+
+        try:
+            await self.app(scope,receive,send_wrapper)
+        finally:
+            if token is not None:
+                current_request.reset(token)
+            for statement,count in stats.repeated(threshold):
+                logging.warning("N+1 query in %s %s: ran %d times with different parameters: %s",
+                                scope["method"],scope["path"],count," ".join(statement.split())[:300])
+
+
+def assert_query_budget(response,max_queries:int)->None:
+    """Fail a test if a route ran more than max_queries statements or an N+1 loop.
+
+    Reads the headers QueryDebugMiddleware adds, so the app under test must
+    have it installed (DB_QUERY_DEBUG, or wrap the app in it).
+    """
+    queries=response.headers.get("X-DB-Queries")
+    if queries is None:
+        raise AssertionError("response has no X-DB-Queries header, is QueryDebugMiddleware installed?")
+    if int(queries)>max_queries:
+        raise AssertionError(f"{response.request.method} {response.request.url.path} ran {queries} queries, the budget is {max_queries}")
+    repeated=response.headers.get("X-DB-N-Plus-One")
+    if repeated is not None:
+        raise AssertionError(f"{response.request.method} {response.request.url.path} ran {repeated} statement(s) as an N+1 loop")
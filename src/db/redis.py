@@ -1,25 +1,199 @@
 from redis.asyncio import Redis
+from redis.exceptions import ConnectionError as RedisConnectionError,RedisError
 
 from src.config import Config
+from src.metrics import observe_blocklist,redis_blocklist_calls
+from src.tracing import traced
+import asyncio
+import json
+import logging
+import time
 
 JTI_EXPIRY=3600
+BLOCKLIST_CHANNEL="auth:blocklist:add"
+# Sorted set of revoked JTIs scored by expiry, used to (re)build the local mirror
+BLOCKLIST_INDEX="auth:blocklist:index"
+# Hash of user_uid -> token generation, tokens minted with an older generation are revoked
+TOKEN_GENERATIONS="auth:token-generations"
 
 token_blocklist=Redis(
     host=Config.REDIS_HOST,
     port=Config.REDIS_PORT,
     db=0
-    
+
+)
+
+# Separate logical db so response cache keys never mix with revoked JTIs
+response_cache=Redis(
+    host=Config.REDIS_HOST,
+    port=Config.REDIS_PORT,
+    db=1
+)
+
+# Rate limit buckets, shared by every worker so limits hold across the fleet
+rate_limit_store=Redis(
+    host=Config.REDIS_HOST,
+    port=Config.REDIS_PORT,
+    db=2
 )
 
-async def add_jti_to_blocklist(jti:str)->None:
-    await token_blocklist.set(
-        name=jti,
-        value="",
-        ex=JTI_EXPIRY
-    )
 
+class BlocklistMirror:
+    """Worker-local copy of the revoked JTIs and per-user token generations.
+
+    While subscribed to BLOCKLIST_CHANNEL the mirror is authoritative and
+    token_revoked() answers from memory. Whenever the subscription is
+    down it reports not ready and lookups fall back to Redis, so a revocation
+    is never missed for longer than pub/sub delivery takes.
+    """
+
+    def __init__(self):
+        self._revoked:dict[str,float]={}
+        self._generations:dict[str,int]={}
+        self.ready=False
+
+    def add(self,jti:str,expires_at:float)->None:
+        self._revoked[jti]=expires_at
+        if len(self._revoked)%1024==0:
+            self.purge()
+
+    def contains(self,jti:str)->bool:
+        expires_at=self._revoked.get(jti)
+        if expires_at is None:
+            return False
+        if expires_at<=time.time():
+            del self._revoked[jti]
+            return False
+        return True
+
+    def set_generation(self,user_uid:str,generation:int)->None:
+        # Generations only move forward, whatever order messages arrive in
+        if generation>self._generations.get(user_uid,0):
+            self._generations[user_uid]=generation
+
+    def generation(self,user_uid:str)->int:
+        return self._generations.get(user_uid,0)
+
+    def purge(self)->None:
+        now=time.time()
+        for jti in [jti for jti,expires_at in self._revoked.items() if expires_at<=now]:
+            del self._revoked[jti]
+
+    async def sync(self)->None:
+        now=time.time()
+        entries=await token_blocklist.zrangebyscore(BLOCKLIST_INDEX,now,"+inf",withscores=True)
+        self._revoked={jti.decode():expires_at for jti,expires_at in entries}
+        generations=await token_blocklist.hgetall(TOKEN_GENERATIONS)
+        self._generations={user_uid.decode():int(generation) for user_uid,generation in generations.items()}
 
+    async def listen(self)->None:
+        """Background task keeping the mirror in step with every worker's revocations.
+
+        A half-open connection would otherwise look like a quiet channel, so
+        after BLOCKLIST_HEARTBEAT_INTERVAL without traffic the subscription is
+        pinged, and a PONG that doesn't arrive within another interval counts
+        as a disconnect: lookups fall back to Redis until the mirror has
+        resubscribed and resynced. A revocation is missed for at most about
+        two intervals.
+        """
+        interval=Config.BLOCKLIST_HEARTBEAT_INTERVAL
+        while True:
+            pubsub=token_blocklist.pubsub()
+            try:
+                await pubsub.subscribe(BLOCKLIST_CHANNEL)
+                pinged=False
+                while True:
+                    message=await pubsub.get_message(timeout=interval)
+                    if message is None:
+                        if pinged:
+                            raise RedisConnectionError("blocklist subscription missed its heartbeat")
+                        await pubsub.ping()
+                        pinged=True
+                        continue
+                    pinged=False
+                    if message["type"]=="subscribe":
+                        # Only load the snapshot once we're sure to see later additions
+                        await self.sync()
+                        self.ready=True
+                    elif message["type"]=="message":
+                        data=json.loads(message["data"])
+                        if "jti" in data:
+                            self.add(data["jti"],data["exp"])
+                        else:
+                            self.set_generation(data["user_uid"],data["gen"])
+            except asyncio.CancelledError:
+                raise
+            except (RedisError,ValueError,KeyError) as e:
+                logging.warning("blocklist subscriber disconnected: %s",e)
+            finally:
+                self.ready=False
+                await pubsub.aclose()
+            await asyncio.sleep(1)
+
+
+blocklist_mirror=BlocklistMirror()
+
+
+@traced("redis.add_jti_to_blocklist")
+async def add_jti_to_blocklist(jti:str,expires_at:float | None=None)->None:
+    """Revoke one token; pass its exp so the entry lives exactly as long as the token"""
+    if expires_at is None:
+        expires_at=time.time()+JTI_EXPIRY
+    blocklist_mirror.add(jti,expires_at)
+    with observe_blocklist("add"):
+        async with token_blocklist.pipeline(transaction=True) as pipe:
+            pipe.set(name=jti,value="",ex=max(1,int(expires_at-time.time())))
+            pipe.zadd(BLOCKLIST_INDEX,{jti:expires_at})
+            pipe.zremrangebyscore(BLOCKLIST_INDEX,"-inf",time.time())
+            pipe.publish(BLOCKLIST_CHANNEL,json.dumps({"jti":jti,"exp":expires_at}))
+            await pipe.execute()
+
+
+@traced("redis.token_in_blocklist")
 async def token_in_blocklist(jti:str)->bool:
-    jti=await token_blocklist.get(jti)
+    if blocklist_mirror.ready:
+        redis_blocklist_calls.labels("contains","memory").inc()
+        return blocklist_mirror.contains(jti)
+
+    with observe_blocklist("contains"):
+        jti=await token_blocklist.get(jti)
+
+    return jti is not None
+
+
+@traced("redis.bump_token_generation")
+async def bump_token_generation(user_uid:str)->int:
+    """Revoke every access and refresh token issued to this user so far"""
+    with observe_blocklist("bump_generation"):
+        generation=await token_blocklist.hincrby(TOKEN_GENERATIONS,user_uid,1)
+        blocklist_mirror.set_generation(user_uid,generation)
+        await token_blocklist.publish(BLOCKLIST_CHANNEL,json.dumps({"user_uid":user_uid,"gen":generation}))
+    return generation
+
+
+@traced("redis.current_token_generation")
+async def current_token_generation(user_uid:str)->int:
+    """The generation to mint new tokens with, always read from Redis.
+
+    The mirror can lag a bump made on another worker, and a token minted
+    with the old generation would be revoked as soon as the mirror caught up.
+    """
+    with observe_blocklist("generation"):
+        generation=int(await token_blocklist.hget(TOKEN_GENERATIONS,user_uid) or 0)
+    blocklist_mirror.set_generation(user_uid,generation)
+    return generation
+
+
+@traced("redis.token_revoked")
+async def token_revoked(jti:str,user_uid:str,generation:int)->bool:
+    """Blocklist and generation check, from memory or in a single Redis round trip"""
+    if blocklist_mirror.ready:
+        redis_blocklist_calls.labels("revoked","memory").inc()
+        return blocklist_mirror.contains(jti) or generation<blocklist_mirror.generation(user_uid)
 
-    return jti is not None
\ No newline at end of file
+    with observe_blocklist("revoked"):
+        async with token_blocklist.pipeline(transaction=False) as pipe:
+            pipe.get(jti)
+            pipe.hget(TOKEN_GENERATIONS,user_uid)
+            blocked,current=await pipe.execute()
+    return blocked is not None or generation<int(current or 0)
@@ -0,0 +1,26 @@
+from fastapi import APIRouter,Depends,Query
+from src.auth.dependencies import RoleChecker
+from .main import async_engine
+from .metrics import pool_state
+from .slowlog import slow_query_log
+
+db_router=APIRouter()
+role_checker = Depends(RoleChecker(["admin"]))
+
+
+@db_router.get("/pool",dependencies=[role_checker])
+async def get_pool_stats():
+    """Checked out connections and saturation of this worker's pool.
+
+    Checkout wait times, and totals across workers, are on /metrics.
+    """
+    return pool_state(async_engine.pool)
+
+
+@db_router.get("/slow-queries",dependencies=[role_checker])
+async def get_slow_queries(limit:int=Query(50,ge=1,le=1000)):
+    """This worker's most recent slow statements, newest first, with plans where sampled"""
+    return {
+        "threshold_ms":slow_query_log.threshold*1000,
+        "queries":slow_query_log.recent(limit)
+    }
@@ -0,0 +1,134 @@
+from collections import deque
+from datetime import datetime,date
+from decimal import Decimal
+from pathlib import Path
+from sqlalchemy.exc import SQLAlchemyError
+from src.config import Config
+from src.metrics import current_request
+import asyncio
+import greenlet
+import json
+import logging
+import random
+import sys
+import uuid
+
+logger=logging.getLogger("src.db.slowlog")
+
+SRC_ROOT=str(Path(__file__).resolve().parent.parent)
+DB_ROOT=str(Path(__file__).resolve().parent)
+MAX_PARAMETER_LENGTH=64
+MAX_PARAMETERS=20
+
+
+def normalize_parameter(value):
+    """JSON-safe, truncated, and with anything that looks like a secret masked"""
+    if value is None or isinstance(value,(bool,int,float)):
+        return value
+    if isinstance(value,(uuid.UUID,datetime,date,Decimal)):
+        return str(value)
+    if isinstance(value,bytes):
+        return f"<{len(value)} bytes>"
+    if isinstance(value,(list,tuple)):
+        return [normalize_parameter(item) for item in value[:MAX_PARAMETERS]]
+    if isinstance(value,dict):
+        return {key:normalize_parameter(item) for key,item in list(value.items())[:MAX_PARAMETERS]}
+    text=str(value)
+    # bcrypt hashes and JWTs
+    if text.startswith("$2") or (text.startswith("eyJ") and text.count(".")==2):
+        return "<redacted>"
+    return text if len(text)<=MAX_PARAMETER_LENGTH else text[:MAX_PARAMETER_LENGTH]+"..."
+
+
+def calling_function()->str | None:
+    """Innermost frame of our own code outside src/db that issued the statement.
+
+    Cursor events run in the greenlet SQLAlchemy spawns for the sync call, so
+    the awaiting service method is found on the parent greenlet's stack.
+    """
+    current=greenlet.getcurrent()
+    frame=current.parent.gr_frame if current.parent is not None else sys._getframe()
+    while frame is not None:
+        filename=frame.f_code.co_filename
+        if filename.startswith(SRC_ROOT) and not filename.startswith(DB_ROOT):
+            code=frame.f_code
+            return f"{getattr(code,'co_qualname',code.co_name)} (src{filename[len(SRC_ROOT):]}:{frame.f_lineno})"
+        frame=frame.f_back
+    return None
+
+
+class SlowQueryLog:
+    """Statements slower than SLOW_QUERY_THRESHOLD_MS, newest last.
+
+    Each entry has the statement, normalized parameters, duration, the route
+    and the service method that issued it. A sampled share of slow SELECTs
+    (SLOW_QUERY_EXPLAIN_SAMPLE_RATE) is re-run under EXPLAIN (ANALYZE,
+    BUFFERS) on a separate connection in the background, inside a rolled
+    back transaction, and the plan is attached to the entry. Entries are kept
+    per worker in a ring buffer of SLOW_QUERY_BUFFER_SIZE and each one is
+    also logged as a JSON line.
+    """
+
+    def __init__(self,size:int=Config.SLOW_QUERY_BUFFER_SIZE,
+                 threshold_ms:float=Config.SLOW_QUERY_THRESHOLD_MS,
+                 explain_rate:float=Config.SLOW_QUERY_EXPLAIN_SAMPLE_RATE):
+        self.entries:deque[dict]=deque(maxlen=size)
+        self.threshold=threshold_ms/1000
+        self.explain_rate=explain_rate
+        self.engine=None
+        self.explaining:set[asyncio.Task]=set()
+
+    def observe(self,statement:str,parameters,seconds:float)->None:
+        if seconds<self.threshold or statement.lstrip()[:7].upper()=="EXPLAIN":
+            return
+        stats=current_request.get()
+        entry={
+            "at":datetime.now().isoformat(timespec="milliseconds"),
+            "duration_ms":round(seconds*1000,3),
+            "statement":" ".join(statement.split()),
+            "parameters":normalize_parameter(parameters),
+            "route":stats.route if stats is not None else None,
+            "caller":calling_function(),
+            "plan":None,
+        }
+        self.entries.append(entry)
+        logger.warning(json.dumps({"event":"slow_query",**entry},default=str))
+        if self.should_explain(statement):
+            task=asyncio.get_running_loop().create_task(self.explain(entry,statement,parameters))
+            self.explaining.add(task)
+            task.add_done_callback(self.explaining.discard)
+
+    def should_explain(self,statement:str)->bool:
+        # ANALYZE executes the statement, so never for writes; one at a time
+        return (
+            self.explain_rate>0
+            and self.engine is not None
+            and self.engine.dialect.name=="postgresql"
+            and statement.lstrip()[:6].upper()=="SELECT"
+            and not self.explaining
+            and random.random()<self.explain_rate
+        )
+
+    async def explain(self,entry:dict,statement:str,parameters)->None:
+        try:
+            async with self.engine.connect() as conn:
+                async with conn.begin() as transaction:
+                    await conn.exec_driver_sql(
+                        f"SET LOCAL statement_timeout = {int(Config.SLOW_QUERY_EXPLAIN_TIMEOUT_MS)}"
+                    )
+                    result=await conn.exec_driver_sql(
+                        "EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) "+statement,parameters
+                    )
+                    plan=result.scalar()
+                    await transaction.rollback()
+        except SQLAlchemyError as e:
+            logger.warning(json.dumps({"event":"slow_query_explain_failed","statement":entry["statement"],"error":str(e)}))
+            return
+        entry["plan"]=json.loads(plan) if isinstance(plan,str) else plan
+        logger.warning(json.dumps({"event":"slow_query_plan","at":entry["at"],"statement":entry["statement"],"plan":entry["plan"]},default=str))
+
+    def recent(self,limit:int)->list[dict]:
+        return list(self.entries)[-limit:][::-1]
+
+
+slow_query_log=SlowQueryLog()
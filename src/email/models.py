@@ -0,0 +1,32 @@
+from sqlmodel import SQLModel,Field,Column
+from datetime import datetime
+import uuid
+import sqlalchemy.dialects.postgresql as pg
+from sqlalchemy import JSON,Index,text
+from src.email.utils import OutboxStatus
+
+class OutboxMessage(SQLModel, table=True):
+    """An email waiting to be sent, written in the same transaction as the change that caused it"""
+    __tablename__ = "email_outbox"
+    __table_args__ = (
+        Index(
+            "ix_email_outbox_pending_next_attempt_at", "next_attempt_at",
+            postgresql_where=text("status = 'pending'")
+        ),
+    )
+
+    uid: uuid.UUID = Field(
+        sa_column=Column(pg.UUID, primary_key=True, nullable=False, default=uuid.uuid4)
+    )
+
+    recipients: list[str] = Field(sa_column=Column(JSON, nullable=False))
+    subject: str
+    body: str
+
+    status: OutboxStatus = Field(default=OutboxStatus.pending)
+    attempts: int = Field(default=0)
+    last_error: str | None = Field(default=None)
+
+    next_attempt_at:datetime=Field(sa_column=Column(pg.TIMESTAMP,nullable=False,default=datetime.now))
+    created_at:datetime=Field(sa_column=Column(pg.TIMESTAMP,default=datetime.now))
+    sent_at:datetime | None=Field(sa_column=Column(pg.TIMESTAMP,nullable=True))
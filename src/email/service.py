@@ -0,0 +1,98 @@
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from datetime import datetime,timedelta
+from src.db.main import async_session_maker
+from src.mail import mail,create_message
+from src.config import Config
+from src.tracing import tracer
+from .models import OutboxMessage
+from .utils import OutboxStatus
+import asyncio
+import logging
+
+
+class OutboxService:
+    """Transactional email outbox.
+
+    Request handlers only enqueue() into their own session, so the email is
+    committed (or rolled back) together with the change that caused it and
+    SMTP never sits on the request path. run_worker() drains the table in the
+    background with exponential backoff. Rows are claimed with
+    FOR UPDATE SKIP LOCKED plus a lease, so every uvicorn worker can run a
+    drainer without sending the same email twice.
+    """
+
+    def enqueue(self,session:AsyncSession,recipients:list[str],subject:str,body:str)->OutboxMessage:
+        message=OutboxMessage(recipients=recipients,subject=subject,body=body)
+        session.add(message)
+        return message
+
+    def backoff(self,attempts:int)->timedelta:
+        seconds=Config.OUTBOX_BACKOFF_BASE*2**(attempts-1)
+        return timedelta(seconds=min(seconds,Config.OUTBOX_BACKOFF_MAX))
+
+    async def claim_batch(self,session:AsyncSession)->list[OutboxMessage]:
+        now=datetime.now()
+        statement=(
+            select(OutboxMessage)
+            .where(OutboxMessage.status==OutboxStatus.pending)
+            .where(OutboxMessage.next_attempt_at<=now)
+            .order_by(OutboxMessage.next_attempt_at)
+            .limit(Config.OUTBOX_BATCH_SIZE)
+            .with_for_update(skip_locked=True)
+        )
+        result=await session.exec(statement)
+        messages=result.all()
+        for message in messages:
+            # Lease the row: if this worker dies mid-send it becomes due again
+            message.attempts+=1
+            message.next_attempt_at=now+timedelta(seconds=Config.OUTBOX_LEASE_SECONDS)
+        await session.commit()
+        return messages
+
+    async def drain_once(self)->int:
+        """Send one batch of due messages, returns how many were claimed"""
+        async with async_session_maker() as session:
+            messages=await self.claim_batch(session)
+            if not messages:
+                return 0
+
+            # Traced per claimed batch, empty polls would only crowd out request traces
+            with tracer.trace("outbox.drain",messages=len(messages)):
+                results=await mail.send_many([
+                    create_message(recipients=message.recipients,subject=message.subject,body=message.body)
+                    for message in messages
+                ])
+
+                now=datetime.now()
+                for message,outcome in zip(messages,results):
+                    if outcome is None:
+                        message.status=OutboxStatus.sent
+                        message.sent_at=now
+                        continue
+                    message.last_error=str(outcome)[:1000]
+                    if message.attempts>=Config.OUTBOX_MAX_ATTEMPTS:
+                        message.status=OutboxStatus.failed
+                        logging.error("email %s failed permanently: %s",message.uid,outcome)
+                    else:
+                        message.next_attempt_at=now+self.backoff(message.attempts)
+                        logging.warning("email %s failed, attempt %s: %s",message.uid,message.attempts,outcome)
+                    session.add(message)
+                await session.commit()
+            return len(messages)
+
+    async def run_worker(self)->None:
+        while True:
+            try:
+                claimed=await self.drain_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logging.exception(e)
+                claimed=0
+            # A full batch means there is probably more waiting
+            if claimed<Config.OUTBOX_BATCH_SIZE:
+                await asyncio.sleep(Config.OUTBOX_POLL_INTERVAL)
+
+
+outbox_service=OutboxService()
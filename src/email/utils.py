@@ -0,0 +1,6 @@
+from enum import Enum
+
+class OutboxStatus(str, Enum):
+    pending = "pending"
+    sent = "sent"
+    failed = "failed"
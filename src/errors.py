@@ -49,6 +49,12 @@ class TagAlreadyExists(TaskException):
 class UserNotFound(TaskException):
     """User Not found"""
     pass
+class RateLimitExceeded(TaskException):
+    """Client has made too many requests to a throttled endpoint"""
+    def __init__(self,retry_after:int):
+        super().__init__(retry_after)
+        self.retry_after=retry_after
+
 class AccountNotVerified(Exception):
     """Acoount Not  yet verified """
     pass
@@ -180,6 +186,13 @@ def register_all_errors(app:FastAPI):
             },
         ),
     )
+    @app.exception_handler(RateLimitExceeded)
+    async def rate_limit_exceeded(request:Request,exc:RateLimitExceeded):
+        return JSONResponse(
+            content={"message":"Too many requests, please try again later","error_code":"rate_limited"},
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            headers={"Retry-After":str(exc.retry_after)}
+        )
     @app.exception_handler(500)
     async def internal_server_error(request,exception):
         return JSONResponse(
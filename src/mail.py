@@ -1,24 +1,173 @@
-from fastapi_mail import FastMail,ConnectionConfig,MessageSchema,MessageType
+from fastapi_mail import ConnectionConfig,MessageSchema,MessageType
+from email.message import EmailMessage
+from email.utils import formataddr
 from src.config import Config
+from src.metrics import mail_send_duration,mail_sent
+from src.tracing import tracer
 from pathlib import Path
+import aiosmtplib
+import asyncio
+import time
 
 BASE_DIR=Path(__file__).resolve().parent
 
-mail_config=ConnectionConfig( 
+mail_config=ConnectionConfig(
     MAIL_USERNAME=Config.MAIL_USERNAME,
     MAIL_PASSWORD=Config.MAIL_PASSWORD,
     MAIL_FROM=Config.MAIL_FROM,
-    MAIL_PORT=587,
+    MAIL_PORT=Config.MAIL_PORT,
     MAIL_SERVER=Config.MAIL_SERVER,
     MAIL_FROM_NAME=Config.MAIL_FROM_NAME,
-    MAIL_STARTTLS=True,
-    MAIL_SSL_TLS=False,
-    USE_CREDENTIALS=True,
-    VALIDATE_CERTS=True,
+    MAIL_STARTTLS=Config.MAIL_STARTTLS,
+    MAIL_SSL_TLS=Config.MAIL_SSL_TLS,
+    USE_CREDENTIALS=Config.USE_CREDENTIALS,
+    VALIDATE_CERTS=Config.VALIDATE_CERTS,
     TEMPLATE_FOLDER=Path(BASE_DIR,'templates')
    )
 
-mail=FastMail(
+
+class RateLimiter:
+    """Token bucket capping how many messages per second leave this process"""
+
+    def __init__(self,rate:float,burst:int | None=None):
+        self.rate=rate
+        self.capacity=burst or max(1,int(rate))
+        self.tokens=float(self.capacity)
+        self.updated=time.monotonic()
+        self.lock=asyncio.Lock()
+
+    async def acquire(self)->None:
+        if self.rate<=0:
+            return
+        async with self.lock:
+            while True:
+                now=time.monotonic()
+                self.tokens=min(self.capacity,self.tokens+(now-self.updated)*self.rate)
+                self.updated=now
+                if self.tokens>=1:
+                    self.tokens-=1
+                    return
+                await asyncio.sleep((1-self.tokens)/self.rate)
+
+
+class PooledConnection:
+    def __init__(self,smtp:aiosmtplib.SMTP):
+        self.smtp=smtp
+        self.sent=0
+        self.last_used=time.monotonic()
+
+
+class PooledMailer:
+    """Sends mail over a pool of authenticated, long-lived SMTP connections.
+
+    Drop-in for FastMail.send_message: instead of a new connect+STARTTLS+AUTH
+    per message, up to MAIL_POOL_SIZE sessions are kept open and reused for
+    MAIL_POOL_MAX_MESSAGES each. Idle or broken sessions are replaced on the
+    next send, and MAIL_RATE_LIMIT caps messages/sec for the whole process.
+    """
+
+    def __init__(self,config:ConnectionConfig,pool_size:int=Config.MAIL_POOL_SIZE,
+                 max_messages:int=Config.MAIL_POOL_MAX_MESSAGES,
+                 idle_timeout:float=Config.MAIL_POOL_IDLE_TIMEOUT,
+                 rate_limit:float=Config.MAIL_RATE_LIMIT):
+        self.config=config
+        self.max_messages=max_messages
+        self.idle_timeout=idle_timeout
+        self.limiter=RateLimiter(rate_limit)
+        self.slots=asyncio.Semaphore(pool_size)
+        self.idle:list[PooledConnection]=[]
+
+    async def connect(self)->PooledConnection:
+        config=self.config
+        smtp=aiosmtplib.SMTP(
+            hostname=config.MAIL_SERVER,
+            port=config.MAIL_PORT,
+            use_tls=config.MAIL_SSL_TLS,
+            start_tls=config.MAIL_STARTTLS,
+            validate_certs=config.VALIDATE_CERTS,
+            timeout=config.TIMEOUT,
+            local_hostname=config.LOCAL_HOSTNAME
+        )
+        await smtp.connect()
+        if config.USE_CREDENTIALS:
+            await smtp.login(config.MAIL_USERNAME,config.MAIL_PASSWORD.get_secret_value())
+        return PooledConnection(smtp)
+
+    async def close(self,connection:PooledConnection)->None:
+        try:
+            await connection.smtp.quit()
+        except aiosmtplib.SMTPException:
+            connection.smtp.close()
+
+    async def acquire(self)->PooledConnection:
+        while self.idle:
+            connection=self.idle.pop()
+            stale=time.monotonic()-connection.last_used>self.idle_timeout
+            if connection.smtp.is_connected and not stale:
+                return connection
+            await self.close(connection)
+        return await self.connect()
+
+    async def release(self,connection:PooledConnection)->None:
+        connection.last_used=time.monotonic()
+        if connection.sent>=self.max_messages:
+            await self.close(connection)
+        else:
+            self.idle.append(connection)
+
+    def build(self,message:MessageSchema)->EmailMessage:
+        email=EmailMessage()
+        email["From"]=formataddr((self.config.MAIL_FROM_NAME or "",self.config.MAIL_FROM))
+        email["To"]=", ".join(message.recipients)
+        email["Subject"]=message.subject
+        subtype="html" if message.subtype==MessageType.html else "plain"
+        email.set_content(message.body or "",subtype=subtype)
+        return email
+
+    async def send_message(self,message:MessageSchema)->None:
+        start=time.perf_counter()
+        try:
+            with tracer.span("smtp.send",recipients=len(message.recipients)):
+                await self.deliver(message)
+        except Exception:
+            mail_sent.labels("error").inc()
+            raise
+        finally:
+            mail_send_duration.observe(time.perf_counter()-start)
+        mail_sent.labels("sent").inc()
+
+    async def deliver(self,message:MessageSchema)->None:
+        email=self.build(message)
+        await self.limiter.acquire()
+        async with self.slots:
+            connection=await self.acquire()
+            try:
+                try:
+                    await connection.smtp.send_message(email)
+                except aiosmtplib.SMTPServerDisconnected:
+                    # The server dropped a pooled session, retry once on a fresh one
+                    connection.smtp.close()
+                    connection=await self.connect()
+                    await connection.smtp.send_message(email)
+            except Exception:
+                connection.smtp.close()
+                raise
+            connection.sent+=1
+            await self.release(connection)
+
+    async def send_many(self,messages:list[MessageSchema])->list[Exception | None]:
+        """Send a batch over the pool, returning the error (or None) per message"""
+        results=await asyncio.gather(
+            *(self.send_message(message) for message in messages),return_exceptions=True
+        )
+        return [result if isinstance(result,Exception) else None for result in results]
+
+    async def aclose(self)->None:
+        while self.idle:
+            await self.close(self.idle.pop())
+
+
+mail=PooledMailer(
     config=mail_config
 )
 
@@ -30,4 +179,4 @@ def create_message(recipients:list[str],subject:str,body:str):
         subtype=MessageType.html
     )
 
-    return message
\ No newline at end of file
+    return message
@@ -0,0 +1,179 @@
+"""Prometheus metrics. With several uvicorn workers set PROMETHEUS_MULTIPROC_DIR
+to an empty directory shared by all of them (before they start) and /metrics
+aggregates every worker's samples instead of reporting whichever one answered.
+"""
+
+from fastapi import APIRouter,FastAPI
+from fastapi.responses import Response
+from prometheus_client import CONTENT_TYPE_LATEST,REGISTRY,CollectorRegistry,Counter,Gauge,Histogram,generate_latest,multiprocess
+from starlette.routing import Match
+from contextlib import contextmanager
+from contextvars import ContextVar
+import os
+import time
+
+LATENCY_BUCKETS=(0.005,0.01,0.025,0.05,0.1,0.25,0.5,1.0,2.5,5.0,10.0)
+STATEMENT_BUCKETS=(0,1,2,5,10,20,50,100,250)
+POOL_WAIT_BUCKETS=(0.001,0.005,0.01,0.05,0.1,0.5,1.0,5.0)
+
+http_requests=Counter(
+    "http_requests_total","HTTP requests handled",["method","route","status"]
+)
+http_request_duration=Histogram(
+    "http_request_duration_seconds","Time spent handling a request",["method","route"],
+    buckets=LATENCY_BUCKETS
+)
+http_requests_in_progress=Gauge(
+    "http_requests_in_progress","Requests currently being handled",["method","route"],
+    multiprocess_mode="livesum"
+)
+sql_statements=Histogram(
+    "db_statements_per_request","SQL statements executed while handling one request",["route"],
+    buckets=STATEMENT_BUCKETS
+)
+sql_statement_duration=Histogram(
+    "db_statement_duration_seconds","Time spent executing a SQL statement",["operation"],
+    buckets=LATENCY_BUCKETS
+)
+# Saturation across workers: sum(db_pool_checked_out) / sum(db_pool_capacity)
+db_pool_checkout_wait=Histogram(
+    "db_pool_checkout_wait_seconds","Time spent waiting to check a connection out of the pool",
+    buckets=POOL_WAIT_BUCKETS
+)
+db_pool_checkout_timeouts=Counter(
+    "db_pool_checkout_timeouts_total","Checkouts that gave up waiting for a connection"
+)
+db_pool_checked_out=Gauge(
+    "db_pool_checked_out","Connections currently checked out of the pool",
+    multiprocess_mode="livesum"
+)
+db_pool_overflow=Gauge(
+    "db_pool_overflow","Connections open beyond pool_size",
+    multiprocess_mode="livesum"
+)
+db_pool_capacity=Gauge(
+    "db_pool_capacity","Most connections the pool will open, pool_size plus max_overflow",
+    multiprocess_mode="livesum"
+)
+redis_blocklist_calls=Counter(
+    "redis_blocklist_calls_total","Token blocklist lookups and updates",["operation","source"]
+)
+redis_blocklist_duration=Histogram(
+    "redis_blocklist_duration_seconds","Time spent in Redis for token blocklist calls",["operation"],
+    buckets=LATENCY_BUCKETS
+)
+mail_sent=Counter(
+    "mail_send_total","Messages handed to the SMTP pool",["result"]
+)
+mail_send_duration=Histogram(
+    "mail_send_duration_seconds","Time to send one message, including the rate limiter wait",
+    buckets=LATENCY_BUCKETS
+)
+websocket_connections=Gauge(
+    "websocket_connections","Open task event WebSockets",
+    multiprocess_mode="livesum"
+)
+websocket_events=Counter(
+    "websocket_events_total","Task events handed to WebSockets",["result"]
+)
+
+
+class RequestMetrics:
+    def __init__(self,route:str | None=None,track_statements:bool=False):
+        self.route=route
+        self.statements=0
+        self.statement_time=0.0
+        # statement text -> hashes of the distinct parameters it ran with
+        self.track_statements=track_statements
+        self.parameters:dict[str,set[int]]={}
+
+    def repeated(self,threshold:int)->list[tuple[str,int]]:
+        """Statements run with at least threshold different parameter sets, i.e. N+1 loops"""
+        return [(statement,len(params)) for statement,params in self.parameters.items() if len(params)>=threshold]
+
+
+# Set for the duration of each HTTP request so engine events can attribute statements
+current_request:ContextVar[RequestMetrics | None]=ContextVar("current_request",default=None)
+
+
+def observe_statement(operation:str,seconds:float,statement:str | None=None,parameters=None)->None:
+    sql_statement_duration.labels(operation).observe(seconds)
+    stats=current_request.get()
+    if stats is not None:
+        stats.statements+=1
+        stats.statement_time+=seconds
+        if stats.track_statements and statement is not None:
+            stats.parameters.setdefault(statement,set()).add(hash(repr(parameters)))
+
+
+@contextmanager
+def observe_blocklist(operation:str):
+    """Count and time one blocklist call that goes to Redis"""
+    redis_blocklist_calls.labels(operation,"redis").inc()
+    start=time.perf_counter()
+    try:
+        yield
+    finally:
+        redis_blocklist_duration.labels(operation).observe(time.perf_counter()-start)
+
+
+def route_name(app:FastAPI,scope:dict)->str:
+    # The route template keeps label cardinality bounded, unlike the raw path
+    for route in app.router.routes:
+        match,_=route.matches(scope)
+        if match==Match.FULL:
+            return getattr(route,"path",route.name)
+    return "unmatched"
+
+
+class PrometheusMiddleware:
+    def __init__(self,app,router_app:FastAPI):
+        self.app=app
+        self.router_app=router_app
+
+    async def __call__(self,scope,receive,send):
+        if scope["type"]!="http":
+            await self.app(scope,receive,send)
+            return
+        method=scope["method"]
+        route=route_name(self.router_app,scope)
+        status_code=500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"]=="http.response.start":
+                status_code=message["status"]
+            await send(message)
+
+        stats=RequestMetrics(route=f"{method} {route}")
+        token=current_request.set(stats)
+        in_progress=http_requests_in_progress.labels(method,route)
+        in_progress.inc()
+        start=time.perf_counter()
+        try:
+            await self.app(scope,receive,send_wrapper)
+        finally:
+            in_progress.dec()
+            current_request.reset(token)
+            http_request_duration.labels(method,route).observe(time.perf_counter()-start)
+            http_requests.labels(method,route,str(status_code)).inc()
+            sql_statements.labels(route).observe(stats.statements)
+
+
+def mark_process_dead()->None:
+    """Drop this worker's live gauges from the shared multiprocess directory"""
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        multiprocess.mark_process_dead(os.getpid())
+
+
+metrics_router=APIRouter()
+
+
+@metrics_router.get("/metrics",include_in_schema=False)
+async def get_metrics():
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        registry=CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry=REGISTRY
+    return Response(content=generate_latest(registry),media_type=CONTENT_TYPE_LATEST)
@@ -1,6 +1,78 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.trustedhost import TrustedHostMiddleware
+from src.metrics import PrometheusMiddleware
+from src.db.metrics import QueryDebugMiddleware
+from src.db.redis import token_revoked
+from src.auth.utils import decode_token_cached
+from src.profiling import StackSampler,DeterministicProfiler,profile_path
+from src.tracing import TracingMiddleware
+from src.config import Config
+from starlette.datastructures import Headers,MutableHeaders
+import asyncio
+import logging
+import random
+
+
+class ProfilingMiddleware:
+    """Opt-in (PROFILING_ENABLED) profiling of single requests.
+
+    A request is profiled when an admin sends `X-Profile: 1` (stack sampling,
+    written as folded stacks for flamegraph.pl/speedscope) or
+    `X-Profile: cprofile` (deterministic, written as pstats), or when it is
+    picked by PROFILING_SAMPLE_RATE. Files land in PROFILING_DIR and the
+    response names its file in X-Profile-File. One request per worker is
+    profiled at a time; when PROFILING_ENABLED is off the middleware is not
+    installed at all.
+    """
+
+    def __init__(self,app):
+        self.app=app
+        self.busy=False
+
+    async def requested_mode(self,scope)->str | None:
+        headers=Headers(scope=scope)
+        mode=headers.get("x-profile")
+        if mode:
+            scheme,_,token=headers.get("authorization","").partition(" ")
+            claims=decode_token_cached(token) if scheme.lower()=="bearer" and token else None
+            if claims is None or claims.get("refresh") or claims["user"].get("role")!="admin":
+                return None
+            if await token_revoked(claims["jti"],claims["user"]["user_uid"],claims.get("gen",0)):
+                return None
+            return "cprofile" if mode.lower()=="cprofile" else "sample"
+        if Config.PROFILING_SAMPLE_RATE>0 and random.random()<Config.PROFILING_SAMPLE_RATE:
+            return "sample"
+        return None
+
+    async def __call__(self,scope,receive,send):
+        if scope["type"]!="http" or self.busy:
+            await self.app(scope,receive,send)
+            return
+        mode=await self.requested_mode(scope)
+        if mode is None or self.busy:
+            await self.app(scope,receive,send)
+            return
+
+        profiler=DeterministicProfiler() if mode=="cprofile" else StackSampler(Config.PROFILING_INTERVAL)
+        path=profile_path(Config.PROFILING_DIR,scope["method"],scope["path"],profiler.extension)
+
+        async def send_wrapper(message):
+            if message["type"]=="http.response.start":
+                MutableHeaders(scope=message)["X-Profile-File"]=path.name
+            await send(message)
+
+        self.busy=True
+        profiler.start()
+        try:
+            await self.app(scope,receive,send_wrapper)
+        finally:
+            profiler.stop()
+            self.busy=False
+            try:
+                await asyncio.to_thread(profiler.write,path)
+            except OSError as e:
+                logging.warning("could not write profile %s: %s",path,e)
 
 def register_middleware(app: FastAPI):
     """Register all middleware"""
@@ -14,6 +86,20 @@ def register_middleware(app: FastAPI):
         allow_headers=["*"],
     )
     
+    # Opt-in SQL accounting headers, see QueryDebugMiddleware
+    if Config.DB_QUERY_DEBUG:
+        app.add_middleware(QueryDebugMiddleware)
+
+    if Config.TRACING_ENABLED:
+        app.add_middleware(TracingMiddleware,router_app=app)
+
+    # Not installed unless enabled, so it costs nothing otherwise
+    if Config.PROFILING_ENABLED:
+        app.add_middleware(ProfilingMiddleware)
+
+    # Added last so it is outermost and times the whole request
+    app.add_middleware(PrometheusMiddleware,router_app=app)
+
     # Optional: Remove TrustedHostMiddleware if it causes issues
     # app.add_middleware(
     #     TrustedHostMiddleware,
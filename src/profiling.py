@@ -0,0 +1,87 @@
+"""Per-request profilers used by ProfilingMiddleware.
+
+Both watch the event loop thread, so time the profiled request spends
+awaiting shows up as the loop's select() or as whatever other request ran
+meanwhile. Profile on a quiet worker, or read the profile for the frames
+under the route's handler.
+"""
+
+from collections import Counter
+from pathlib import Path
+import cProfile
+import re
+import sys
+import threading
+import time
+
+
+def frame_label(frame)->str:
+    code=frame.f_code
+    filename=code.co_filename
+    # site-packages/fastapi/routing.py rather than the full interpreter path
+    marker=filename.rfind("site-packages/")
+    if marker!=-1:
+        filename=filename[marker+len("site-packages/"):]
+    return f"{code.co_name} ({filename}:{code.co_firstlineno})"
+
+
+class StackSampler:
+    """Samples one thread's stack every `interval` seconds into folded stacks.
+
+    The output is the collapsed format read by flamegraph.pl, speedscope
+    and inferno: one "outer;...;inner count" line per distinct stack.
+    """
+
+    extension="folded"
+
+    def __init__(self,interval:float):
+        self.interval=interval
+        self.thread_id=threading.get_ident()
+        self.stacks:Counter[str]=Counter()
+        self.stopped=threading.Event()
+        self.thread=threading.Thread(target=self.run,name="profiler",daemon=True)
+
+    def start(self)->None:
+        self.thread.start()
+
+    def run(self)->None:
+        while not self.stopped.wait(self.interval):
+            frame=sys._current_frames().get(self.thread_id)
+            stack=[]
+            while frame is not None:
+                stack.append(frame_label(frame))
+                frame=frame.f_back
+            if stack:
+                self.stacks[";".join(reversed(stack))]+=1
+
+    def stop(self)->None:
+        self.stopped.set()
+        self.thread.join()
+
+    def write(self,path:Path)->None:
+        path.write_text("".join(f"{stack} {count}\n" for stack,count in self.stacks.most_common()))
+
+
+class DeterministicProfiler:
+    """cProfile over the request, saved as pstats for snakeviz or flameprof"""
+
+    extension="prof"
+
+    def __init__(self):
+        self.profile=cProfile.Profile()
+
+    def start(self)->None:
+        self.profile.enable()
+
+    def stop(self)->None:
+        self.profile.disable()
+
+    def write(self,path:Path)->None:
+        self.profile.dump_stats(path)
+
+
+def profile_path(directory:str,method:str,path:str,extension:str)->Path:
+    route=re.sub(r"[^A-Za-z0-9_.-]","_",path.strip("/")) or "root"
+    folder=Path(directory)
+    folder.mkdir(parents=True,exist_ok=True)
+    return folder/f"{time.strftime('%Y%m%d-%H%M%S')}-{time.time_ns()%10**9:09d}-{method}-{route[:80]}.{extension}"
@@ -0,0 +1,113 @@
+from redis.exceptions import RedisError
+from src.db.redis import response_cache
+from src.config import Config
+import hashlib
+import json
+import logging
+import uuid
+
+ADMIN_SCOPE="admin"
+
+
+class TaskCache:
+    """Read-through Redis cache for task list and task detail responses.
+
+    Entries are the serialized JSON bodies, so a hit is returned as-is
+    without being parsed or validated again.
+
+    Keys embed version counters instead of being deleted on writes: a write
+    bumps the versions of every scope that can see the task (creator,
+    old and new assignee, admins, the task itself) so stale entries are never
+    read again and simply expire after TASK_CACHE_TTL.
+    """
+
+    def __init__(self,redis=response_cache,ttl:int=Config.TASK_CACHE_TTL):
+        self.redis=redis
+        self.ttl=ttl
+        self.hits=0
+        self.misses=0
+        self.errors=0
+
+    @staticmethod
+    def _scope(user_uid:str,is_admin:bool)->str:
+        return ADMIN_SCOPE if is_admin else f"user:{user_uid}"
+
+    @staticmethod
+    def _version_key(scope:str)->str:
+        return f"task:ver:{scope}"
+
+    @staticmethod
+    def _task_scope(task_id)->str:
+        # Canonical form, so /task/<ID> in any case shares the version invalidate() bumps
+        return f"task:{uuid.UUID(str(task_id))}"
+
+    @staticmethod
+    def _digest(params:dict)->str:
+        raw=json.dumps(params,sort_keys=True,default=str)
+        return hashlib.sha1(raw.encode()).hexdigest()[:16]
+
+    async def _get(self,version_scope:str,key_suffix:str):
+        try:
+            version=await self.redis.get(self._version_key(version_scope)) or b"0"
+            key=f"task:cache:{version_scope}:{version.decode()}:{key_suffix}"
+            payload=await self.redis.get(key)
+        except RedisError as e:
+            # Cache is best effort, fall through to Postgres
+            logging.warning("task cache unavailable: %s",e)
+            self.errors+=1
+            return None,None
+        if payload is None:
+            self.misses+=1
+            return key,None
+        self.hits+=1
+        return key,payload
+
+    async def set(self,key:str | None,body:bytes)->None:
+        """Store a response body under the key returned by get_list/get_detail"""
+        if key is None:
+            return
+        try:
+            await self.redis.set(key,body,ex=self.ttl)
+        except RedisError as e:
+            logging.warning("task cache unavailable: %s",e)
+            self.errors+=1
+
+    async def get_list(self,user_uid:str,is_admin:bool,filters:dict):
+        scope=self._scope(user_uid,is_admin)
+        return await self._get(scope,f"list:{self._digest(filters)}")
+
+    async def get_detail(self,task_id:str,user_uid:str,is_admin:bool):
+        # Keyed per viewer so the visibility check is never skipped for someone else
+        viewer=self._scope(user_uid,is_admin)
+        return await self._get(self._task_scope(task_id),f"detail:{viewer}")
+
+    async def invalidate(self,task_id,*user_uids)->None:
+        """Bump every version a change to this task can be visible through"""
+        await self.invalidate_many([(task_id,*user_uids)])
+
+    async def invalidate_many(self,entries)->None:
+        """invalidate() for many (task_id, *user_uids) entries in one round trip"""
+        scopes={ADMIN_SCOPE}
+        for task_id,*user_uids in entries:
+            scopes.add(self._task_scope(task_id))
+            scopes.update(f"user:{uid}" for uid in user_uids if uid is not None)
+        try:
+            async with self.redis.pipeline(transaction=False) as pipe:
+                for scope in scopes:
+                    pipe.incr(self._version_key(scope))
+                await pipe.execute()
+        except RedisError as e:
+            logging.warning("task cache invalidation failed: %s",e)
+            self.errors+=1
+
+    def stats(self)->dict:
+        lookups=self.hits+self.misses
+        return {
+            "hits":self.hits,
+            "misses":self.misses,
+            "errors":self.errors,
+            "hit_ratio":round(self.hits/lookups,4) if lookups else 0.0
+        }
+
+
+task_cache=TaskCache()
@@ -3,10 +3,22 @@ from datetime import datetime,date
 import uuid
 import sqlalchemy.dialects.postgresql as pg
 from src.tasks.utils import TaskStatus, TaskPriority
-from sqlalchemy import ForeignKey   
+from sqlalchemy import ForeignKey,Index,text
 
 class Tasks(SQLModel, table=True):
     __tablename__ = "tasks"
+    # Matched to get_tasks: newest-first keyset order, the
+    # created_by OR assigned_to visibility check and the status/priority filters
+    __table_args__ = (
+        Index("ix_tasks_created_at_uid", "created_at", "uid"),
+        Index("ix_tasks_created_by_created_at_uid", "created_by", "created_at", "uid"),
+        Index(
+            "ix_tasks_assigned_to_created_at_uid", "assigned_to", "created_at", "uid",
+            postgresql_where=text("assigned_to IS NOT NULL")
+        ),
+        Index("ix_tasks_status_created_at_uid", "status", "created_at", "uid"),
+        Index("ix_tasks_priority_created_at_uid", "priority", "created_at", "uid"),
+    )
 
     uid: uuid.UUID = Field(
         sa_column=Column(pg.UUID, primary_key=True, nullable=False, default=uuid.uuid4)
@@ -1,18 +1,38 @@
-from fastapi import APIRouter,Depends,HTTPException,status
+from fastapi import APIRouter,Depends,HTTPException,Query
+from fastapi.responses import Response,StreamingResponse
 from src.auth.dependencies import RoleChecker
-from .schemas import TaskCreateSchema,TaskResponseSchema,TaskUpdateSchema
+from .schemas import TaskCreateSchema,TaskResponseSchema,TaskUpdateSchema,TaskPageSchema,TaskBulkUpdateSchema,TaskBulkResponseSchema
+from .schemas import task_adapter,task_list_adapter,task_page_adapter
+from pydantic import TypeAdapter
 from sqlmodel.ext.asyncio.session import AsyncSession
 from src.db.main import get_session
 from src.auth.dependencies import AccessTokenBearer
 from .service import TaskService
-from typing import Optional
+from .cache import task_cache
+from typing import Optional,Literal
+import os
+import uuid
 from src.errors import TaskNotFound
 from src.auth.service import AuthService
+from src.tracing import tracer
 task_router=APIRouter()
 task_service=TaskService()
 auth_service=AuthService()
 role_checker = Depends(RoleChecker(["admin"]))
 
+BULK_MAX_ITEMS = 10000
+
+
+def render(adapter: TypeAdapter, content) -> bytes:
+    """Validate once against the response schema and dump straight to JSON bytes"""
+    with tracer.span("serialize"):
+        return adapter.dump_json(adapter.validate_python(content))
+
+
+def json_body(body: bytes) -> Response:
+    # A Response skips response_model, the declared model still documents it
+    return Response(content=body, media_type="application/json")
+
 
 @task_router.post("/tasks/", response_model=TaskResponseSchema, dependencies=[role_checker])
 async def create_task(
@@ -24,22 +44,55 @@ async def create_task(
 
     task = await task_service.create_task(task_data, user_uid, session)
 
-    assigned_email = None
-    assigned_name = None
+    hydrated = await task_service.hydrate_tasks([task], session)
+    return hydrated[0]
+
+def check_bulk_size(items: list):
+    if len(items) > BULK_MAX_ITEMS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"At most {BULK_MAX_ITEMS} items per bulk request"
+        )
+
+
+@task_router.post("/tasks/bulk", response_model=TaskBulkResponseSchema, dependencies=[role_checker])
+async def bulk_create_tasks(
+    tasks_data: list[TaskCreateSchema],
+    session: AsyncSession = Depends(get_session),
+    token_details: dict = Depends(AccessTokenBearer())
+):
+    check_bulk_size(tasks_data)
+    user_uid = token_details["user"]["user_uid"]
+
+    return await task_service.bulk_create_tasks(tasks_data, user_uid, session)
 
-    if task.assigned_to:
-        user = await auth_service.get_user_by_uid(task.assigned_to, session)
-        if user:
-            assigned_email = user.email
-            assigned_name = user.firstname
+@task_router.patch("/tasks/bulk", response_model=TaskBulkResponseSchema)
+async def bulk_update_tasks(
+    updates: list[TaskBulkUpdateSchema],
+    session: AsyncSession = Depends(get_session),
+    token_details: dict = Depends(AccessTokenBearer())
+):
+    check_bulk_size(updates)
+    user_uid = token_details["user"]["user_uid"]
+    user_role = token_details["user"].get("role", "user")
+    is_admin = user_role == "admin"
+
+    return await task_service.bulk_update_tasks(updates, session, user_uid, is_admin)
 
-    return {
-        **task.model_dump(),
-        "assigned_to": assigned_email,
-        "assigned_to_name": assigned_name
-    }
+@task_router.post("/tasks/bulk/delete", response_model=TaskBulkResponseSchema)
+async def bulk_delete_tasks(
+    task_ids: list[uuid.UUID],
+    session: AsyncSession = Depends(get_session),
+    token_details: dict = Depends(AccessTokenBearer())
+):
+    check_bulk_size(task_ids)
+    user_uid = token_details["user"]["user_uid"]
+    user_role = token_details["user"].get("role", "user")
+    is_admin = user_role == "admin"
 
-@task_router.get("/tasks/", response_model=list[TaskResponseSchema])
+    return await task_service.bulk_delete_tasks(task_ids, session, user_uid, is_admin)
+
+@task_router.get("/tasks/", response_model=list[TaskResponseSchema] | TaskPageSchema)
 async def get_tasks(
     session: AsyncSession = Depends(get_session),
     token_details: dict = Depends(AccessTokenBearer()),
@@ -47,46 +100,101 @@ async def get_tasks(
     priority: Optional[str] = None,
     assigned_to: Optional[str] = None,
     limit: int = 10,
-    offset: int = 0
+    offset: int = 0,
+    cursor: Optional[str] = None
 ):
+    """Pass `cursor` (empty for the first page) to get keyset pages with a
+    `next_cursor`; without it the legacy limit/offset list is returned."""
     user_uid = token_details["user"]["user_uid"]
     user_role = token_details["user"].get("role", "user")
     is_admin = user_role == "admin"
 
-    tasks = await task_service.get_tasks(
-        session=session,
-        user_uid=user_uid,
-        is_admin=is_admin,
+    filters = dict(
         status=status,
         priority=priority,
         assigned_to=assigned_to,
-        limit=limit,
-        offset=offset
+        limit=limit
+    )
+
+    cache_key, cached = await task_cache.get_list(
+        user_uid, is_admin, {**filters, "offset": offset, "cursor": cursor}
+    )
+    if cached is not None:
+        return json_body(cached)
+
+    if cursor is not None:
+        page = await task_service.get_tasks_page(
+            session=session, user_uid=user_uid, is_admin=is_admin, **filters, cursor=cursor
+        )
+        body = render(task_page_adapter, page)
+    else:
+        tasks = await task_service.get_tasks(
+            session=session, user_uid=user_uid, is_admin=is_admin, **filters, offset=offset
+        )
+        body = render(task_list_adapter, tasks)
+
+    await task_cache.set(cache_key, body)
+    return json_body(body)
+
+@task_router.get("/tasks/export")
+async def export_tasks(
+    session: AsyncSession = Depends(get_session),
+    token_details: dict = Depends(AccessTokenBearer()),
+    status: Optional[str] = None,
+    priority: Optional[str] = None,
+    assigned_to: Optional[str] = None,
+    export_format: Literal["ndjson", "csv"] = Query("ndjson", alias="format")
+):
+    """Stream every visible task matching the same filters as GET /tasks/"""
+    user_uid = token_details["user"]["user_uid"]
+    user_role = token_details["user"].get("role", "user")
+    is_admin = user_role == "admin"
+
+    query = await task_service.filtered_tasks_query(
+        session, user_uid, is_admin, status, priority, assigned_to
+    )
+
+    media_type = "text/csv" if export_format == "csv" else "application/x-ndjson"
+    return StreamingResponse(
+        task_service.export_tasks(query, export_format),
+        media_type=media_type,
+        headers={"Content-Disposition": f"attachment; filename=tasks.{export_format}"}
     )
-    
-    return tasks
 
 @task_router.get("/task/{task_id}",response_model=TaskResponseSchema)
-async def get_task_by_id(task_id:str,session:AsyncSession=Depends(get_session), token_details: dict = Depends(AccessTokenBearer())):
+async def get_task_by_id(task_id:uuid.UUID,session:AsyncSession=Depends(get_session), token_details: dict = Depends(AccessTokenBearer())):
     user_uid = token_details["user"]["user_uid"]
     user_role = token_details["user"].get("role", "user")
     is_admin = user_role == "admin"
 
-    task=await task_service.get_task_by_id(
+    cache_key,cached=await task_cache.get_detail(task_id,user_uid,is_admin)
+    if cached is not None:
+        return json_body(cached)
+
+    task=await task_service.get_visible_task(
         task_id=task_id,
         session=session,
         user_uid=user_uid,
         is_admin=is_admin
     )
+    hydrated=await task_service.hydrate_tasks([task],session)
+
+    body=render(task_adapter,hydrated[0])
+    await task_cache.set(cache_key,body)
+    return json_body(body)
 
-    return task
+@task_router.get("/tasks/cache/stats",dependencies=[role_checker])
+async def get_cache_stats():
+    """Hit/miss counters of the task response cache for this worker"""
+    return {"pid":os.getpid(),**task_cache.stats()}
 
 @task_router.patch("/tasks/{task_id}")
 async def update_task(task_id:str,task_update_data:TaskUpdateSchema,session:AsyncSession=Depends(get_session),token_details:dict=Depends(AccessTokenBearer())):
     
     updated_task=await task_service.update_task(task_id,task_update_data,session)
     if updated_task:
-        return updated_task
+        hydrated=await task_service.hydrate_tasks([updated_task],session)
+        return hydrated[0]
     else:
         return TaskNotFound()
 
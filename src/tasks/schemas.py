@@ -1,5 +1,5 @@
-from pydantic import BaseModel, EmailStr
-from typing import Optional
+from pydantic import BaseModel, EmailStr, TypeAdapter
+from typing import Optional, List
 import uuid
 from datetime import datetime, date
 
@@ -30,4 +30,31 @@ class TaskResponseSchema(BaseModel):
     assigned_to_name: Optional[str] = None  # Optional: user's name
     created_by: uuid.UUID
     created_at: datetime
-    updated_at: datetime
\ No newline at end of file
+    updated_at: datetime
+
+class TaskPageSchema(BaseModel):
+    items: List[TaskResponseSchema]
+    next_cursor: Optional[str] = None  # Pass back as ?cursor= for the next page
+
+
+class TaskBulkUpdateSchema(TaskUpdateSchema):
+    uid: uuid.UUID
+
+
+class TaskBulkErrorSchema(BaseModel):
+    index: int  # Position of the item in the request array
+    uid: Optional[uuid.UUID] = None
+    detail: str
+
+
+class TaskBulkResponseSchema(BaseModel):
+    succeeded: List[TaskResponseSchema] = []
+    deleted: List[uuid.UUID] = []
+    errors: List[TaskBulkErrorSchema] = []
+
+
+# Built once at import: validating and dumping through these turns rows into
+# JSON bytes in one pass, instead of response_model re-validating our output
+task_adapter = TypeAdapter(TaskResponseSchema)
+task_list_adapter = TypeAdapter(List[TaskResponseSchema])
+task_page_adapter = TypeAdapter(TaskPageSchema)
@@ -1,18 +1,40 @@
 from .models import Tasks
-from .schemas import TaskCreateSchema,TaskUpdateSchema
+from .schemas import TaskCreateSchema,TaskUpdateSchema,TaskResponseSchema,TaskBulkUpdateSchema,task_adapter,task_list_adapter
 from sqlmodel.ext.asyncio.session import AsyncSession
-from src.db.main import get_session
+from src.db.main import get_session,async_session_maker
 from typing import Optional
-from sqlmodel import select
-from .utils import TaskPriority,TaskStatus
+from sqlmodel import select,desc
+from sqlalchemy import tuple_,insert,delete
+from .utils import TaskPriority,TaskStatus,encode_cursor,decode_cursor,encode_csv_rows
+import uuid
 from fastapi import HTTPException,status
 from src.auth.service import AuthService
-from src.mail import mail,create_message
+from src.email.service import outbox_service
+from .cache import task_cache
+from src.tracing import traced
+from src.collaboration.service import collaboration_service
+from src.collaboration.utils import TaskEventType
 
 
 auth_service=AuthService()
 
+EXPORT_CHUNK_SIZE=1000
+EXPORT_FIELDS=list(TaskResponseSchema.model_fields)
+# Read straight off the row; the assignee fields are resolved in hydrate_tasks
+TASK_FIELDS=[field for field in EXPORT_FIELDS if field not in ("assigned_to","assigned_to_name")]
+
+def response_fields(task: Tasks) -> dict:
+    """The row's response fields, read from its loaded state where possible.
+
+    Cheaper than model_dump(), which walks every column, and than getattr(),
+    which goes through the instrumented attribute on each access.
+    """
+    state = task.__dict__
+    return {field: state[field] if field in state else getattr(task, field) for field in TASK_FIELDS}
+
+
 class TaskService:
+    @traced()
     async def create_task(self, task_data: TaskCreateSchema, user_uid: str, session: AsyncSession):
         task_data_dict = task_data.model_dump()
         
@@ -39,25 +61,27 @@ class TaskService:
         )
 
         session.add(new_task)
-        await session.commit()
-        await session.refresh(new_task)
 
+        # Queued in the same transaction, sent by the outbox worker
         if assigned_to_uid:
-            await self.send_assignment_email(new_task, assigned_to_uid, session)
+            self.queue_assignment_email(new_task, user, session)
+
+        await session.commit()
+        await session.refresh(new_task)
+        await task_cache.invalidate(new_task.uid, new_task.created_by, new_task.assigned_to)
+        await self.publish_task_events(TaskEventType.created, [new_task], session)
 
         return new_task
 
     
-    async def get_tasks(
+    async def filtered_tasks_query(
         self,
         session: AsyncSession,
         user_uid: str,
         is_admin: bool,
         status: Optional[TaskStatus] = None,
         priority: Optional[TaskPriority] = None,
-        assigned_to: Optional[str] = None,
-        limit: int = 10,
-        offset: int = 0
+        assigned_to: Optional[str] = None
     ):
         query = select(Tasks)
 
@@ -78,47 +102,132 @@ class TaskService:
             if user:
                 query = query.where(Tasks.assigned_to == user.uid)
 
+        # Newest first, uid breaks ties so the order is total
+        return query.order_by(desc(Tasks.created_at), desc(Tasks.uid))
 
+    @traced()
+    async def get_tasks(
+        self,
+        session: AsyncSession,
+        user_uid: str,
+        is_admin: bool,
+        status: Optional[TaskStatus] = None,
+        priority: Optional[TaskPriority] = None,
+        assigned_to: Optional[str] = None,
+        limit: int = 10,
+        offset: int = 0
+    ):
+        """Legacy limit/offset pagination"""
+        query = await self.filtered_tasks_query(
+            session, user_uid, is_admin, status, priority, assigned_to
+        )
         query = query.limit(limit).offset(offset)
 
         result = await session.exec(query)
         tasks= result.all()
-         # Convert tasks to response format with email strings
+
+        return await self.hydrate_tasks(tasks, session)
+
+    @traced()
+    async def get_tasks_page(
+        self,
+        session: AsyncSession,
+        user_uid: str,
+        is_admin: bool,
+        status: Optional[TaskStatus] = None,
+        priority: Optional[TaskPriority] = None,
+        assigned_to: Optional[str] = None,
+        limit: int = 10,
+        cursor: Optional[str] = None
+    ):
+        """Keyset pagination: seek past the cursor on (created_at, uid) instead of skipping rows"""
+        query = await self.filtered_tasks_query(
+            session, user_uid, is_admin, status, priority, assigned_to
+        )
+
+        if cursor:
+            try:
+                created_at, uid = decode_cursor(cursor)
+            except ValueError:
+                raise HTTPException(status_code=400, detail="Invalid cursor")
+            query = query.where(tuple_(Tasks.created_at, Tasks.uid) < tuple_(created_at, uid))
+
+        # Fetch one extra row to know whether there is a next page
+        result = await session.exec(query.limit(limit + 1))
+        tasks = result.all()
+
+        next_cursor = None
+        if len(tasks) > limit:
+            tasks = tasks[:limit]
+            next_cursor = encode_cursor(tasks[-1].created_at, tasks[-1].uid)
+
+        return {
+            "items": await self.hydrate_tasks(tasks, session),
+            "next_cursor": next_cursor
+        }
+
+    async def export_tasks(self, query, export_format: str = "ndjson"):
+        """Stream every row of `query` as NDJSON or CSV bytes.
+
+        Runs on its own session because the response body is produced after
+        the request's session dependency has been closed. Rows come from a
+        server-side cursor EXPORT_CHUNK_SIZE at a time, so memory stays flat
+        regardless of how many tasks are exported.
+        """
+        async with async_session_maker() as session:
+            result = await session.stream(query.execution_options(yield_per=EXPORT_CHUNK_SIZE))
+
+            if export_format == "csv":
+                yield encode_csv_rows([EXPORT_FIELDS])
+
+            async for tasks in result.scalars().partitions():
+                rows = await self.hydrate_tasks(tasks, session)
+                if export_format == "csv":
+                    yield encode_csv_rows([row.get(field) for field in EXPORT_FIELDS] for row in rows)
+                else:
+                    yield b"".join(task_adapter.dump_json(task) + b"\n" for task in task_list_adapter.validate_python(rows))
+
+                # Let the identity map drop rows we've already sent
+                session.expunge_all()
+
+    @traced()
+    async def hydrate_tasks(self, tasks, session: AsyncSession):
+        """Convert tasks to response format, resolving every assignee in one query"""
+        assignees = await auth_service.get_users_by_uids(
+            (task.assigned_to for task in tasks), session
+        )
+
         response_tasks = []
         for task in tasks:
-            task_dict = task.model_dump()
-            
+            task_dict = response_fields(task)
+
             # Convert assigned_to UUID to email string
-            if task.assigned_to:
-                user = await auth_service.get_user_by_uid(task.assigned_to, session)
-                if user:
-                    task_dict['assigned_to'] = user.email
-                    task_dict['assigned_to_name'] = user.firstname
-                else:
-                    task_dict['assigned_to'] = None
-                    task_dict['assigned_to_name'] = None
-            
+            user = assignees.get(task.assigned_to)
+            task_dict['assigned_to'] = user.email if user else None
+            task_dict['assigned_to_name'] = user.firstname if user else None
+
             response_tasks.append(task_dict)
-        
+
         return response_tasks
 
     
-    async def get_task_by_id(self,task_id:str,session:AsyncSession,user_uid:str,is_admin:bool):
-        statement=select(Tasks).where(Tasks.uid==task_id)
-        result=await session.exec(statement)
-        task=result.first()
+    @traced()
+    async def get_visible_task(self,task_id:str,session:AsyncSession,user_uid:str,is_admin:bool):
+        task=await self.get_task_by_id(task_id,session)
         if not task:
-            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,detail={"Task not found"})
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,detail="Task not found")
         
-        if not is_admin and task.created_by!=user_uid and task.assigned_to!=user_uid:
-            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN,detail={"You are not authorized to view this task"})
+        if not is_admin and str(task.created_by)!=user_uid and str(task.assigned_to)!=user_uid:
+            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN,detail="You are not authorized to view this task")
         return task
+    @traced()
     async def get_task_by_id(self,task_id:str,session:AsyncSession):
         statement=select(Tasks).where(Tasks.uid==task_id)
         result=await session.exec(statement)
         task=result.first()
         if task:
             return task
+    @traced()
     async def update_task(self, task_id: str, task_data: TaskUpdateSchema, session: AsyncSession):
         task = await self.get_task_by_id(task_id, session)
         if not task:
@@ -147,17 +256,20 @@ class TaskService:
         for key, value in update_data.items():
             setattr(task, key, value)
 
-        await session.commit()
-        await session.refresh(task)
-
         # 🔔 EMAIL TRIGGER LOGIC
         new_assigned_to = update_data.get("assigned_to")
         if "assigned_to" in update_data and new_assigned_to != old_assigned_to:
             if new_assigned_to is not None:
-                await self.send_assignment_email(task, new_assigned_to, session)
+                self.queue_assignment_email(task, user, session)
+
+        await session.commit()
+        await session.refresh(task)
+        await task_cache.invalidate(task.uid, task.created_by, old_assigned_to, task.assigned_to)
+        await self.publish_task_events(TaskEventType.updated, [task], session, {task.uid: old_assigned_to})
 
         return task
         
+    @traced()
     async def delete_task(
         self,
         task_id: str,
@@ -175,13 +287,216 @@ class TaskService:
 
         await session.delete(task)
         await session.commit()
+        await task_cache.invalidate(task.uid, task.created_by, task.assigned_to)
+        await collaboration_service.publish([
+            collaboration_service.task_event(TaskEventType.deleted, task.uid, (task.created_by, task.assigned_to))
+        ])
 
-    async def send_assignment_email(self, task, user_uid: str, session: AsyncSession):
-        user = await auth_service.get_user_by_uid(user_uid,session)
+    async def publish_task_events(self, event_type: TaskEventType, tasks, session: AsyncSession,
+                                  previous_assignees: Optional[dict] = None, hydrated: Optional[list] = None):
+        """Push committed changes to the creator's and assignees' open WebSockets
 
-        if not user:
+        Only the creator and the current assignee can still see the task, so a
+        previous assignee gets the event without its body, like a delete.
+        """
+        if not tasks:
             return
+        previous_assignees = previous_assignees or {}
+        if hydrated is None:
+            hydrated = await self.hydrate_tasks(tasks, session)
+        events = []
+        for task, body in zip(tasks, hydrated):
+            events.append(collaboration_service.task_event(event_type, task.uid, (task.created_by, task.assigned_to), body))
+            previous = previous_assignees.get(task.uid)
+            if previous is not None and previous not in (task.created_by, task.assigned_to):
+                events.append(collaboration_service.task_event(event_type, task.uid, (previous,)))
+        await collaboration_service.publish(events)
+
+    @staticmethod
+    def invalid_enum_value(task_data: dict) -> Optional[str]:
+        """Catch bad status/priority up front so one row can't fail a whole batch"""
+        if task_data.get('status') is not None and task_data['status'] not in TaskStatus._value2member_map_:
+            return f"Invalid status {task_data['status']}"
+        if task_data.get('priority') is not None and task_data['priority'] not in TaskPriority._value2member_map_:
+            return f"Invalid priority {task_data['priority']}"
+        return None
+
+    @traced()
+    async def bulk_create_tasks(self, tasks_data: list[TaskCreateSchema], user_uid: str, session: AsyncSession):
+        """Create many tasks with one assignee lookup and one multi-row INSERT ... RETURNING"""
+        assignees = await auth_service.get_users_by_emails(
+            (task_data.assigned_to for task_data in tasks_data), session
+        )
+
+        rows = []
+        errors = []
+        for index, task_data in enumerate(tasks_data):
+            task_data_dict = task_data.model_dump()
+            email = task_data_dict.pop('assigned_to', None)
+
+            error = self.invalid_enum_value(task_data_dict)
+            if email and email not in assignees:
+                error = f"User with email {email} not found"
+            if error:
+                errors.append({"index": index, "detail": error})
+                continue
+
+            rows.append({
+                **task_data_dict,
+                "created_by": user_uid,
+                "assigned_to": assignees[email].uid if email else None
+            })
+
+        created = []
+        if rows:
+            statement = insert(Tasks).returning(Tasks, sort_by_parameter_order=True)
+            result = await session.exec(statement, params=rows)
+            created = result.scalars().all()
+            await self.queue_bulk_assignment_emails(created, session)
+            await session.commit()
+            await task_cache.invalidate_many(
+                (task.uid, task.created_by, task.assigned_to) for task in created
+            )
+
+        succeeded = await self.hydrate_tasks(created, session)
+        await self.publish_task_events(TaskEventType.created, created, session, hydrated=succeeded)
+        return {
+            "succeeded": succeeded,
+            "errors": errors
+        }
+
+    @traced()
+    async def bulk_update_tasks(
+        self,
+        updates: list[TaskBulkUpdateSchema],
+        session: AsyncSession,
+        user_uid: str,
+        is_admin: bool
+    ):
+        """Apply many partial updates with one task query, one assignee query and one commit"""
+        result = await session.exec(select(Tasks).where(Tasks.uid.in_({item.uid for item in updates})))
+        tasks = {task.uid: task for task in result.all()}
+        assignees = await auth_service.get_users_by_emails(
+            (item.assigned_to for item in updates), session
+        )
 
+        updated = {}
+        errors = []
+        invalidations = []
+        previous_assignees = {}
+        newly_assigned = []
+        for index, item in enumerate(updates):
+            task = tasks.get(item.uid)
+            if not task:
+                errors.append({"index": index, "uid": item.uid, "detail": "Task not found"})
+                continue
+            if not is_admin and str(task.created_by) != user_uid and str(task.assigned_to) != user_uid:
+                errors.append({"index": index, "uid": item.uid, "detail": "Not allowed"})
+                continue
+
+            update_data = item.model_dump(exclude_unset=True, exclude={"uid"})
+            error = self.invalid_enum_value(update_data)
+            if 'assigned_to' in update_data:
+                email = update_data['assigned_to']
+                if email and email not in assignees:
+                    error = f"User with email {email} not found"
+                else:
+                    update_data['assigned_to'] = assignees[email].uid if email else None
+            if error:
+                errors.append({"index": index, "uid": item.uid, "detail": error})
+                continue
+
+            old_assigned_to = task.assigned_to
+            for key, value in update_data.items():
+                setattr(task, key, value)
+
+            invalidations.append((task.uid, task.created_by, old_assigned_to, task.assigned_to))
+            previous_assignees.setdefault(task.uid, old_assigned_to)
+            if task.assigned_to is not None and task.assigned_to != old_assigned_to:
+                newly_assigned.append(task)
+            updated[task.uid] = task
+
+        if updated:
+            await self.queue_bulk_assignment_emails(newly_assigned, session)
+            await session.commit()
+            await task_cache.invalidate_many(invalidations)
+
+        tasks = list(updated.values())
+        succeeded = await self.hydrate_tasks(tasks, session)
+        await self.publish_task_events(TaskEventType.updated, tasks, session, previous_assignees, succeeded)
+        return {
+            "succeeded": succeeded,
+            "errors": errors
+        }
+
+    @traced()
+    async def bulk_delete_tasks(
+        self,
+        task_ids: list[uuid.UUID],
+        session: AsyncSession,
+        user_uid: str,
+        is_admin: bool
+    ):
+        """Delete many tasks with one permission query and one DELETE ... WHERE uid IN (...)"""
+        statement = select(Tasks.uid, Tasks.created_by, Tasks.assigned_to).where(Tasks.uid.in_(set(task_ids)))
+        result = await session.exec(statement)
+        found = {row[0]: row for row in result.all()}
+
+        allowed = {}
+        errors = []
+        for index, task_id in enumerate(task_ids):
+            row = found.get(task_id)
+            if not row:
+                errors.append({"index": index, "uid": task_id, "detail": "Task not found"})
+            elif not is_admin and str(row[1]) != user_uid:
+                errors.append({"index": index, "uid": task_id, "detail": "Not allowed"})
+            else:
+                allowed[task_id] = row
+
+        if allowed:
+            await session.exec(delete(Tasks).where(Tasks.uid.in_(allowed.keys())))
+            await session.commit()
+            await task_cache.invalidate_many(allowed.values())
+            await collaboration_service.publish([
+                collaboration_service.task_event(TaskEventType.deleted, uid, (created_by, assigned_to))
+                for uid, created_by, assigned_to in allowed.values()
+            ])
+
+        return {"deleted": list(allowed), "errors": errors}
+
+    async def queue_bulk_assignment_emails(self, tasks, session: AsyncSession):
+        """Queue one email per assignee listing all of their new tasks"""
+        tasks_by_assignee = {}
+        for task in tasks:
+            if task.assigned_to is not None:
+                tasks_by_assignee.setdefault(task.assigned_to, []).append(task)
+        if not tasks_by_assignee:
+            return
+
+        users = await auth_service.get_users_by_uids(tasks_by_assignee.keys(), session)
+
+        for assignee_uid, assigned_tasks in tasks_by_assignee.items():
+            user = users.get(assignee_uid)
+            if not user:
+                continue
+            items = "".join(
+                f"<li><b>{task.title}</b> (due {task.due_date}, {task.status})</li>"
+                for task in assigned_tasks
+            )
+            html = f"""
+        <h2>New Tasks Assigned</h2>
+        <p>Hello {user.firstname},</p>
+        <p>You have been assigned {len(assigned_tasks)} new task(s):</p>
+        <ul>{items}</ul>
+        """
+            outbox_service.enqueue(
+                session,
+                recipients=[user.email],
+                subject="You have been assigned tasks",
+                body=html
+            )
+
+    def queue_assignment_email(self, task, user, session: AsyncSession):
         html = f"""
         <h2>New Task Assigned</h2>
         <p>Hello {user.firstname},</p>
@@ -193,10 +508,9 @@ class TaskService:
         </ul>
         """
 
-        message = create_message(
+        outbox_service.enqueue(
+            session,
             recipients=[user.email],
             subject="You have been assigned a task",
             body=html
         )
-
-        await mail.send_message(message)
\ No newline at end of file
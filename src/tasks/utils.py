@@ -1,4 +1,10 @@
 from enum import Enum
+from datetime import datetime
+import base64
+import csv
+import io
+import json
+import uuid
 
 class TaskStatus(str, Enum):
     pending = "pending"
@@ -9,3 +15,24 @@ class TaskPriority(str, Enum):
     low = "low"
     medium = "medium"
     high = "high"
+
+
+def encode_cursor(created_at:datetime,uid:uuid.UUID)->str:
+    """Build an opaque keyset cursor from the last row of a page"""
+    payload=json.dumps([created_at.isoformat(),str(uid)],separators=(",",":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor:str)->tuple[datetime,uuid.UUID]:
+    """Inverse of encode_cursor, raises ValueError on a malformed cursor"""
+    try:
+        padded=cursor+"="*(-len(cursor)%4)
+        created_at,uid=json.loads(base64.urlsafe_b64decode(padded))
+        return datetime.fromisoformat(created_at),uuid.UUID(uid)
+    except (TypeError,ValueError) as e:
+        raise ValueError("Invalid cursor") from e
+
+def encode_csv_rows(rows)->bytes:
+    """Encode one chunk of CSV rows for a streaming response"""
+    buffer=io.StringIO()
+    csv.writer(buffer).writerows(rows)
+    return buffer.getvalue().encode()
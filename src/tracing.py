@@ -0,0 +1,196 @@
+"""In-process tracing: per-request span trees without an external collector.
+
+TracingMiddleware opens a root span for each sampled request and the outbox
+worker opens one per drained batch; everything underneath (token checks,
+blocklist calls, service methods, SQL statements, serialization, SMTP) adds
+child spans through the `current_span` contextvar. When the root finishes the
+whole trace goes to the exporter: InMemoryExporter keeps the last
+TRACING_MEMORY_LIMIT traces for tests and debugging, JsonlExporter appends
+one span per line to TRACING_FILE.
+
+Outside a sampled trace `span()` and `traced` cost a contextvar lookup.
+"""
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from pathlib import Path
+from starlette.datastructures import MutableHeaders
+from src.config import Config
+from src.metrics import route_name
+import json
+import random
+import threading
+import time
+import uuid
+
+
+class Span:
+    __slots__=("trace","span_id","parent_id","name","attributes","start","started","duration","error")
+
+    def __init__(self,trace:"Trace",name:str,parent_id:str | None,attributes:dict):
+        self.trace=trace
+        self.span_id=uuid.uuid4().hex[:16]
+        self.parent_id=parent_id
+        self.name=name
+        self.attributes=attributes
+        self.start=time.time()
+        self.started=time.perf_counter()
+        self.duration=None
+        self.error=None
+
+    def set(self,key:str,value)->None:
+        self.attributes[key]=value
+
+    def to_dict(self)->dict:
+        return {
+            "trace_id":self.trace.trace_id,
+            "span_id":self.span_id,
+            "parent_id":self.parent_id,
+            "name":self.name,
+            "start":self.start,
+            "duration_ms":round(self.duration*1000,3) if self.duration is not None else None,
+            "attributes":self.attributes,
+            "error":self.error,
+        }
+
+
+class Trace:
+    def __init__(self):
+        self.trace_id=uuid.uuid4().hex
+        self.spans:list[Span]=[]
+        self.root:Span | None=None
+
+
+current_span:ContextVar[Span | None]=ContextVar("current_span",default=None)
+
+
+class InMemoryExporter:
+    """Keeps finished traces so tests can assert on them"""
+
+    def __init__(self,limit:int=Config.TRACING_MEMORY_LIMIT):
+        self.traces:deque[list[dict]]=deque(maxlen=limit)
+
+    def export(self,spans:list[dict])->None:
+        self.traces.append(spans)
+
+    def spans(self,trace_id:str | None=None,name:str | None=None)->list[dict]:
+        return [
+            span for trace in self.traces for span in trace
+            if (trace_id is None or span["trace_id"]==trace_id) and (name is None or span["name"]==name)
+        ]
+
+    def clear(self)->None:
+        self.traces.clear()
+
+
+class JsonlExporter:
+    """Appends one JSON object per span to a local file"""
+
+    def __init__(self,path:str=Config.TRACING_FILE):
+        self.path=Path(path)
+        self.lock=threading.Lock()
+
+    def export(self,spans:list[dict])->None:
+        lines="".join(json.dumps(span,default=str)+"\n" for span in spans)
+        with self.lock,self.path.open("a") as file:
+            file.write(lines)
+
+
+class Tracer:
+    def __init__(self,enabled:bool,sample_rate:float,exporter):
+        self.enabled=enabled
+        self.sample_rate=sample_rate
+        self.exporter=exporter
+
+    def start_span(self,name:str,parent:Span,attributes:dict | None=None)->Span:
+        """Child span that is not made current, for callers that can't use span()"""
+        return Span(parent.trace,name,parent.span_id,attributes or {})
+
+    def finish(self,span:Span)->None:
+        span.duration=time.perf_counter()-span.started
+        trace=span.trace
+        trace.spans.append(span)
+        if span is trace.root:
+            self.exporter.export([span.to_dict() for span in trace.spans])
+
+    @contextmanager
+    def activate(self,span:Span):
+        token=current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.error=repr(e)
+            raise
+        finally:
+            current_span.reset(token)
+            self.finish(span)
+
+    @contextmanager
+    def trace(self,name:str,**attributes):
+        """Root span, started only if tracing is on and this trace is sampled"""
+        if not self.enabled or random.random()>=self.sample_rate:
+            yield None
+            return
+        trace=Trace()
+        trace.root=Span(trace,name,None,attributes)
+        with self.activate(trace.root) as root:
+            yield root
+
+    @contextmanager
+    def span(self,name:str,**attributes):
+        parent=current_span.get()
+        if parent is None:
+            yield None
+            return
+        with self.activate(self.start_span(name,parent,attributes)) as span:
+            yield span
+
+    def traced(self,name:str | None=None):
+        """Decorator running a coroutine function inside a child span"""
+        def decorator(func):
+            span_name=name or func.__qualname__
+
+            @wraps(func)
+            async def wrapper(*args,**kwargs):
+                parent=current_span.get()
+                if parent is None:
+                    return await func(*args,**kwargs)
+                with self.activate(self.start_span(span_name,parent)):
+                    return await func(*args,**kwargs)
+            return wrapper
+        return decorator
+
+
+tracer=Tracer(
+    enabled=Config.TRACING_ENABLED,
+    sample_rate=Config.TRACING_SAMPLE_RATE,
+    exporter=JsonlExporter() if Config.TRACING_EXPORTER=="jsonl" else InMemoryExporter()
+)
+traced=tracer.traced
+
+
+class TracingMiddleware:
+    """Root span per request, named after the route template, id in X-Trace-Id"""
+
+    def __init__(self,app,router_app):
+        self.app=app
+        self.router_app=router_app
+
+    async def __call__(self,scope,receive,send):
+        if scope["type"]!="http":
+            await self.app(scope,receive,send)
+            return
+        name=f"{scope['method']} {route_name(self.router_app,scope)}"
+        with tracer.trace(name,path=scope["path"]) as root:
+            if root is None:
+                await self.app(scope,receive,send)
+                return
+
+            async def send_wrapper(message):
+                if message["type"]=="http.response.start":
+                    root.set("status",message["status"])
+                    MutableHeaders(scope=message)["X-Trace-Id"]=root.trace.trace_id
+                await send(message)
+
+            await self.app(scope,receive,send_wrapper)
@@ -0,0 +1,97 @@
+"""PooledMailer against a local aiosmtpd server: delivery, connection reuse
+and recycling, and the process-wide send rate."""
+from aiosmtpd.controller import Controller
+from src.mail import PooledMailer,mail_config,create_message
+import asyncio
+import pytest
+import socket
+import time
+
+
+class RecordingHandler:
+    def __init__(self):
+        self.subjects=[]
+        self.peers=set()
+
+    async def handle_DATA(self,server,session,envelope):
+        self.subjects.append(envelope.content.split(b"Subject: ",1)[1].split(b"\r\n",1)[0].decode())
+        # One peer (client port) per SMTP connection
+        self.peers.add(session.peer)
+        return "250 OK"
+
+
+def free_port()->int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1",0))
+        return sock.getsockname()[1]
+
+
+@pytest.fixture
+def smtp_server():
+    handler=RecordingHandler()
+    controller=Controller(handler,hostname="127.0.0.1",port=free_port())
+    controller.start()
+    yield controller,handler
+    controller.stop()
+
+
+def mailer_for(controller,**kwargs)->PooledMailer:
+    config=mail_config.model_copy(update=dict(
+        MAIL_SERVER=controller.hostname,MAIL_PORT=controller.port,
+        MAIL_STARTTLS=False,MAIL_SSL_TLS=False,USE_CREDENTIALS=False
+    ))
+    return PooledMailer(config,**kwargs)
+
+
+def messages(count:int):
+    return [create_message(["user@example.com"],f"message {index}","<b>hello</b>") for index in range(count)]
+
+
+async def send_all(mailer:PooledMailer,batch)->list:
+    try:
+        return await mailer.send_many(batch)
+    finally:
+        await mailer.aclose()
+
+
+def test_send_many_delivers_every_message_over_the_pool(smtp_server):
+    controller,handler=smtp_server
+    mailer=mailer_for(controller,pool_size=4,max_messages=1000,rate_limit=0)
+
+    results=asyncio.run(send_all(mailer,messages(200)))
+
+    assert results==[None]*200
+    assert sorted(handler.subjects)==sorted(f"message {index}" for index in range(200))
+    assert len(handler.peers)<=4
+
+
+def test_connections_are_recycled_after_max_messages(smtp_server):
+    controller,handler=smtp_server
+    mailer=mailer_for(controller,pool_size=1,max_messages=5,rate_limit=0)
+
+    results=asyncio.run(send_all(mailer,messages(12)))
+
+    assert results==[None]*12
+    assert len(handler.peers)==3
+
+
+def test_rate_limit_caps_messages_per_second(smtp_server):
+    controller,handler=smtp_server
+    mailer=mailer_for(controller,pool_size=4,rate_limit=20)
+
+    start=time.monotonic()
+    asyncio.run(send_all(mailer,messages(30)))
+    elapsed=time.monotonic()-start
+
+    # A full bucket of 20 goes at once, the other 10 at 20/s
+    assert len(handler.subjects)==30
+    assert elapsed>=0.45
+
+
+def test_unreachable_server_reports_an_error_per_message():
+    controller=type("Closed",(),{"hostname":"127.0.0.1","port":free_port()})
+    mailer=mailer_for(controller,pool_size=2,rate_limit=0)
+
+    results=asyncio.run(send_all(mailer,messages(3)))
+
+    assert all(isinstance(result,Exception) for result in results)
@@ -0,0 +1,96 @@
+"""Query budgets through QueryDebugMiddleware's X-DB-* headers.
+
+GET /tasks/ resolves a page's assignees with one IN (...) lookup, however
+big the page; the per-row lookup it used to do is caught as an N+1 loop.
+"""
+from fakeredis import FakeAsyncRedis
+from sqlalchemy.orm import sessionmaker
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from starlette.middleware import Middleware
+from benchmarks.seed import seed
+from src import app
+from src.auth.cache import user_cache
+from src.auth.models import User
+from src.db.metrics import QueryDebugMiddleware,assert_query_budget,instrument_engine
+from src.db.slowlog import slow_query_log
+from src.tasks.cache import task_cache
+from src.tasks.service import TaskService
+import asyncio
+import httpx
+import pytest
+
+TASKS="/api/v1/task/tasks/"
+# The page itself, then one lookup for all of its assignees
+LIST_BUDGET=2
+
+
+def response_with(**headers)->httpx.Response:
+    return httpx.Response(200,headers=headers,request=httpx.Request("GET",f"http://test{TASKS}"))
+
+
+def test_assert_query_budget_passes_within_budget():
+    assert_query_budget(response_with(**{"X-DB-Queries":"2"}),LIST_BUDGET)
+
+
+@pytest.mark.parametrize("headers,message",[
+    ({"X-DB-Queries":"12"},"ran 12 queries, the budget is 2"),
+    ({"X-DB-Queries":"2","X-DB-N-Plus-One":"1"},"N\\+1 loop"),
+    ({},"QueryDebugMiddleware installed"),
+])
+def test_assert_query_budget_fails(headers,message):
+    with pytest.raises(AssertionError,match=message):
+        assert_query_budget(response_with(**headers),LIST_BUDGET)
+
+
+@pytest.fixture
+def admin(app_database,auth_headers,monkeypatch):
+    """Seeded data, the SQL accounting headers on and an admin to list as"""
+    engine=app_database
+    monkeypatch.setattr(slow_query_log,"engine",slow_query_log.engine)
+    instrument_engine(engine)
+    # What DB_QUERY_DEBUG does, on a rebuilt middleware stack
+    monkeypatch.setattr(app,"user_middleware",[*app.user_middleware,Middleware(QueryDebugMiddleware)])
+    monkeypatch.setattr(app,"middleware_stack",None)
+    monkeypatch.setattr(task_cache,"redis",FakeAsyncRedis())
+
+    async def setup():
+        await seed(sessionmaker(engine,class_=AsyncSession,expire_on_commit=False),users=20,tasks=200,admins=1)
+        async with AsyncSession(engine) as session:
+            return (await session.exec(select(User).where(User.role=="admin"))).first()
+
+    user=asyncio.run(setup())
+    return auth_headers(user)
+
+
+async def list_tasks(headers:dict,limit:int)->httpx.Response:
+    user_cache.clear()
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app),base_url="http://test") as client:
+        return await client.get(TASKS,params={"limit":limit},headers=headers)
+
+
+@pytest.mark.parametrize("limit",[10,50])
+def test_task_list_stays_within_its_query_budget(admin,limit):
+    response=asyncio.run(list_tasks(admin,limit))
+    assert response.status_code==200
+    assert len(response.json())==limit
+    assert_query_budget(response,LIST_BUDGET)
+
+
+def test_per_row_assignee_lookup_is_caught(admin,monkeypatch):
+    async def hydrate_per_row(self,tasks,session):
+        hydrated=[]
+        for task in tasks:
+            task_dict=task.model_dump()
+            user=(await session.exec(select(User).where(User.uid==task.assigned_to))).first()
+            task_dict["assigned_to"]=user.email if user else None
+            task_dict["assigned_to_name"]=user.firstname if user else None
+            hydrated.append(task_dict)
+        return hydrated
+
+    monkeypatch.setattr(TaskService,"hydrate_tasks",hydrate_per_row)
+    response=asyncio.run(list_tasks(admin,50))
+    assert response.status_code==200
+    assert response.headers["X-DB-N-Plus-One"]=="1"
+    with pytest.raises(AssertionError,match="ran 51 queries"):
+        assert_query_budget(response,LIST_BUDGET)
@@ -0,0 +1,59 @@
+"""The login rate limiter against fakeredis: 429 with Retry-After past the
+limit, and requests one scope rejects don't use up the others."""
+from fakeredis import FakeAsyncRedis
+from src import app
+from src.auth import ratelimit,routes
+from src.config import Config
+from src.db.main import get_session
+import asyncio
+import httpx
+import pytest
+
+LOGIN="/api/v1/auth/login"
+
+
+@pytest.fixture(autouse=True)
+def limiter_store(monkeypatch):
+    """A fresh fakeredis per test, with the Lua script loaded into it"""
+    monkeypatch.setattr(ratelimit,"rate_limit_store",FakeAsyncRedis())
+    monkeypatch.setattr(ratelimit,"_script_hash",None)
+    monkeypatch.setattr(Config,"RATE_LIMIT_ENABLED",True)
+    # The limiter runs before the user lookup, which is left to find nobody
+    monkeypatch.setattr(routes.user_service,"get_user_by_email",lambda email,session:asyncio.sleep(0))
+    app.dependency_overrides[get_session]=lambda:None
+    yield
+    app.dependency_overrides.pop(get_session,None)
+
+
+async def login_attempts(count:int,email:str,ip:str="10.0.0.1")->list[httpx.Response]:
+    transport=httpx.ASGITransport(app=app,client=(ip,40000))
+    async with httpx.AsyncClient(transport=transport,base_url="http://test") as client:
+        return [
+            await client.post(LOGIN,json={"email":email,"password":"wrong-password"})
+            for _ in range(count)
+        ]
+
+
+def test_login_past_the_limit_gets_429_with_retry_after():
+    responses=asyncio.run(login_attempts(Config.LOGIN_RATE_PER_EMAIL+2,"victim@example.com"))
+
+    assert all(response.status_code==400 for response in responses[:Config.LOGIN_RATE_PER_EMAIL])
+    for response in responses[Config.LOGIN_RATE_PER_EMAIL:]:
+        assert response.status_code==429
+        assert response.json()["error_code"]=="rate_limited"
+        assert 1<=int(response.headers["Retry-After"])<=60
+
+
+def test_other_ips_are_not_limited_by_one_ip():
+    asyncio.run(login_attempts(Config.LOGIN_RATE_PER_IP,"first@example.com",ip="10.0.0.1"))
+    response,=asyncio.run(login_attempts(1,"second@example.com",ip="10.0.0.2"))
+    assert response.status_code!=429
+
+
+def test_rejected_requests_do_not_use_up_the_ip_scope():
+    # Only LOGIN_RATE_PER_EMAIL of these get past the email scope
+    responses=asyncio.run(login_attempts(Config.LOGIN_RATE_PER_IP,"victim@example.com"))
+    assert responses[-1].status_code==429
+
+    response,=asyncio.run(login_attempts(1,"colleague@example.com"))
+    assert response.status_code!=429
@@ -0,0 +1,65 @@
+"""The span tree of one authenticated request, read back from InMemoryExporter."""
+from sqlalchemy.orm import sessionmaker
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from starlette.middleware import Middleware
+from benchmarks.seed import seed
+from src import app
+from src.auth.cache import user_cache
+from src.auth.models import User
+from src.db.metrics import instrument_engine
+from src.db.slowlog import slow_query_log
+from src.tracing import InMemoryExporter,TracingMiddleware,tracer
+import asyncio
+import httpx
+import pytest
+
+
+@pytest.fixture
+def exporter(monkeypatch)->InMemoryExporter:
+    """Every request traced into a fresh in-memory exporter"""
+    exporter=InMemoryExporter()
+    monkeypatch.setattr(tracer,"enabled",True)
+    monkeypatch.setattr(tracer,"sample_rate",1.0)
+    monkeypatch.setattr(tracer,"exporter",exporter)
+    # What TRACING_ENABLED does, on a rebuilt middleware stack
+    monkeypatch.setattr(app,"user_middleware",[*app.user_middleware,Middleware(TracingMiddleware,router_app=app)])
+    monkeypatch.setattr(app,"middleware_stack",None)
+    return exporter
+
+
+def test_authenticated_request_span_tree(app_database,auth_headers,exporter,monkeypatch):
+    engine=app_database
+    monkeypatch.setattr(slow_query_log,"engine",slow_query_log.engine)
+    instrument_engine(engine)
+
+    async def run()->httpx.Response:
+        await seed(sessionmaker(engine,class_=AsyncSession,expire_on_commit=False),users=1,tasks=0,admins=0)
+        async with AsyncSession(engine) as session:
+            user=(await session.exec(select(User))).first()
+        user_cache.clear()
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app),base_url="http://test") as client:
+            return await client.get("/api/v1/auth/me",headers=auth_headers(user))
+
+    response=asyncio.run(run())
+    assert response.status_code==200
+
+    trace_id=response.headers["X-Trace-Id"]
+    spans=exporter.spans(trace_id)
+    assert spans and all(span["trace_id"]==trace_id for span in spans)
+    by_name={span["name"]:span for span in spans}
+
+    root=by_name["GET /api/v1/auth/me"]
+    token=by_name["auth.token"]
+    lookup=by_name["AuthService.get_user_by_uid"]
+    assert root["parent_id"] is None
+    assert root["attributes"]["status"]==200
+    assert token["parent_id"]==root["span_id"]
+    assert by_name["auth.decode"]["parent_id"]==token["span_id"]
+    assert by_name["redis.token_revoked"]["parent_id"]==token["span_id"]
+    assert lookup["parent_id"]==root["span_id"]
+
+    queries=exporter.spans(trace_id,"db.query")
+    assert [query["parent_id"] for query in queries]==[lookup["span_id"]]
+    assert queries[0]["attributes"]["statement"].startswith("SELECT")
+    assert lookup["start"]>=by_name["redis.token_revoked"]["start"]